@@ -25,6 +25,9 @@ if env_file.exists():
 
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR.parent / "media"
+# CSV uploads waiting for the import worker; kept outside MEDIA_ROOT so
+# they are never publicly served
+IMPORT_UPLOAD_ROOT = env("IMPORT_UPLOAD_ROOT", default=str(BASE_DIR.parent / "imports"))
 
 SECRET_KEY = env(
     "DJANGO_SECRET_KEY"
@@ -104,6 +107,22 @@ DATABASES = {
     }
 }
 
+# Analytics are cached here and invalidated by whichever process writes
+# (web, scheduler, importer), so separate processes need a shared backend,
+# e.g. CACHE_URL=filecache:///cache.
+CACHES = {"default": env.cache("CACHE_URL", default="locmemcache://")}
+
+# finance.cache.AnalyticsCache options: alias, max_entries, timeout, ...
+FINANCE_ANALYTICS_CACHE = {
+    "max_entries": env.int("ANALYTICS_CACHE_MAX_ENTRIES", default=1000),
+    "timeout": env.int("ANALYTICS_CACHE_TIMEOUT", default=300),
+}
+# The backend culls at MAX_ENTRIES (300 by default), which would undercut the
+# analytics LRU bound; leave room for it plus the single-flight lock keys.
+CACHES["default"].setdefault("OPTIONS", {}).setdefault(
+    "MAX_ENTRIES", 2 * FINANCE_ANALYTICS_CACHE["max_entries"]
+)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
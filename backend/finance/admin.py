@@ -1,6 +1,13 @@
 # backend/finance/admin.py
 from django.contrib import admin
-from .models import Account, Category, Transaction, Budget, RecurringTransaction
+from .models import (
+    Account,
+    Category,
+    Transaction,
+    Budget,
+    RecurringTransaction,
+    ImportJob,
+)
 
 
 @admin.register(Account)
@@ -43,3 +50,9 @@ class TransactionAdmin(admin.ModelAdmin):
 class BudgetAdmin(admin.ModelAdmin):
     list_display = ("id", "user", "category", "amount", "start_date", "end_date")
     list_filter = ("start_date",)
+
+
+@admin.register(ImportJob)
+class ImportJobAdmin(admin.ModelAdmin):
+    list_display = ("id", "user", "status", "rows_processed", "created", "skipped")
+    list_filter = ("status",)
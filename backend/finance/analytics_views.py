@@ -1,17 +1,84 @@
 import datetime
-import calendar
 from django.utils import timezone
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import permissions
-from django.db.models import Sum, OuterRef, Subquery, DecimalField
+from django.db.models import Sum
 from django.db.models.functions import Coalesce
 from decimal import Decimal
 from .serializers import BudgetSerializer, TransactionSerializer
-from .models import Account, Transaction, Budget
+from .models import Account, Transaction
+from .cache import cached_analytics
+from .budgets import evaluate_budgets
+from .forecast import DEFAULT_FORECAST_MONTHS, MAX_FORECAST_MONTHS, forecast_balances
+from .rollups import month_end, month_totals, spending_by_category
+from .snapshots import balance_series
+from .versioning import DataVersionETagMixin
+from .trends import GRANULARITIES, MAX_BUCKETS, bucket_count, cash_flow_trend
 
+# longest balance history served in one request
+MAX_HISTORY_DAYS = 3660
 
-class SummaryAnalyticsView(APIView):
+
+INVALID_MONTH = "Invalid year or month format."
+
+
+def month_range(params):
+    """
+    First and last day of the month given by the year/month query params
+    (default: the current month). Raises ValueError for invalid values.
+    """
+    today = timezone.localdate()
+    year = int(params.get("year", today.year))
+    month = int(params.get("month", today.month))
+    start = datetime.date(year, month, 1)
+    return start, month_end(start)
+
+
+def parse_spending_options(params):
+    """The top/series options of the spending breakdown; ValueError if invalid."""
+    top = params.get("top")
+    if top is not None:
+        if not top.isdigit() or int(top) < 1:
+            raise ValueError("top must be a positive integer.")
+        top = int(top)
+    series = params.get("series")
+    if series not in (None, "day"):
+        raise ValueError("series must be 'day'.")
+    return {"top": top, "series": bool(series)}
+
+
+# The sections below back both their own endpoint and the dashboard.
+
+
+def summary_section(user, start_of_month):
+    total_balance = Account.objects.filter(user=user).aggregate(
+        total=Coalesce(Sum("balance"), Decimal("0.00"))
+    )["total"]
+    # income and expenses in one pass over the month's rollup rows
+    totals = month_totals(user, start_of_month)
+    return {
+        "total_balance": total_balance,
+        "monthly_income": totals["income"],
+        "monthly_expenses": totals["expenses"],
+    }
+
+
+def budget_progress_section(user, start_of_month, end_of_month):
+    budgets = evaluate_budgets(user, start_of_month, end_of_month)
+    return BudgetSerializer(budgets, many=True).data
+
+
+def recent_transactions_section(user, limit=5):
+    transactions = (
+        Transaction.objects.filter(user=user)
+        .select_related("account", "category")
+        .order_by("-date", "-created_at")[:limit]
+    )
+    return TransactionSerializer(transactions, many=True).data
+
+
+class SummaryAnalyticsView(DataVersionETagMixin, APIView):
     """
     Provides summary analytics for the dashboard for a given month.
     - Total balance (independent of month).
@@ -21,149 +88,260 @@ class SummaryAnalyticsView(APIView):
 
     permission_classes = [permissions.IsAuthenticated]
 
+    @cached_analytics("summary")
+    def get(self, request, *args, **kwargs):
+        try:
+            start_of_month, _ = month_range(request.query_params)
+        except ValueError:
+            return Response({"error": INVALID_MONTH}, status=400)
+        return Response(summary_section(request.user, start_of_month))
+
+
+class BudgetProgressView(DataVersionETagMixin, APIView):
+    """
+    Provides budget progress for the specified month: every budget whose
+    period overlaps it, with the amount spent over the budget's period.
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    @cached_analytics("budget-progress")
+    def get(self, request, *args, **kwargs):
+        try:
+            start_of_month, end_of_month = month_range(request.query_params)
+        except ValueError:
+            start_of_month, end_of_month = month_range({})
+        return Response(
+            budget_progress_section(request.user, start_of_month, end_of_month)
+        )
+
+
+class SpendingByCategoryAnalyticsView(DataVersionETagMixin, APIView):
+    """
+    Provides spending breakdown by category for the specified month.
+    Optional params: top (fold the smaller categories into "Other") and
+    series=day (add per-day amounts to every item).
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    @cached_analytics("spending-by-category")
+    def get(self, request, *args, **kwargs):
+        try:
+            start_of_month, _ = month_range(request.query_params)
+        except ValueError:
+            return Response({"error": INVALID_MONTH}, status=400)
+        try:
+            options = parse_spending_options(request.query_params)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=400)
+        return Response(spending_by_category(request.user, start_of_month, **options))
+
+
+class RecentTransactionsView(DataVersionETagMixin, APIView):
+    """
+    Returns the 5 most recent transactions for the dashboard.
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    @cached_analytics("recent-transactions")
+    def get(self, request, *args, **kwargs):
+        return Response(recent_transactions_section(request.user))
+
+
+class DashboardAnalyticsView(DataVersionETagMixin, APIView):
+    """
+    Everything the dashboard shows for a month in one response: the
+    summary, spending by category, budget progress and recent
+    transactions, built by the same code as their own endpoints.
+    Accepts the year/month params and the spending top/series options.
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    @cached_analytics("dashboard")
     def get(self, request, *args, **kwargs):
         user = request.user
         try:
-            year = int(request.query_params.get("year", timezone.now().year))
-            month = int(request.query_params.get("month", timezone.now().month))
-        except (ValueError, TypeError):
-            return Response({"error": "Invalid year or month format."}, status=400)
-
-        start_of_month = datetime.date(year, month, 1)
-        _, last_day = calendar.monthrange(year, month)
-        end_of_month = datetime.date(year, month, last_day)
-
-        total_balance = Account.objects.filter(user=user).aggregate(
-            total=Coalesce(Sum("balance"), Decimal("0.00"))
-        )["total"]
-
-        monthly_income = Transaction.objects.filter(
-            user=user,
-            date__range=[start_of_month, end_of_month],
-            category__type="income",
-        ).aggregate(total=Coalesce(Sum("amount"), Decimal("0.00")))["total"]
-
-        monthly_expenses = Transaction.objects.filter(
-            user=user,
-            date__range=[start_of_month, end_of_month],
-            category__type="expense",
-        ).aggregate(total=Coalesce(Sum("amount"), Decimal("0.00")))["total"]
+            start_of_month, end_of_month = month_range(request.query_params)
+        except ValueError:
+            return Response({"error": INVALID_MONTH}, status=400)
+        try:
+            options = parse_spending_options(request.query_params)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=400)
 
         return Response(
             {
-                "total_balance": total_balance,
-                "monthly_income": monthly_income,
-                "monthly_expenses": monthly_expenses,
+                "year": start_of_month.year,
+                "month": start_of_month.month,
+                "summary": summary_section(user, start_of_month),
+                "spending_by_category": spending_by_category(
+                    user, start_of_month, **options
+                ),
+                "budget_progress": budget_progress_section(
+                    user, start_of_month, end_of_month
+                ),
+                "recent_transactions": recent_transactions_section(user),
             }
         )
 
 
-class BudgetProgressView(APIView):
+class BalanceHistoryView(DataVersionETagMixin, APIView):
     """
-    Provides budget progress for the specified month.
+    Daily end-of-day balances for a balance-over-time chart, per account
+    and in total, read from the balance snapshots.
+    Query params: start, end (YYYY-MM-DD; default the last year up to
+    today) and an optional account id.
     """
 
     permission_classes = [permissions.IsAuthenticated]
 
+    @cached_analytics("balance-history")
     def get(self, request, *args, **kwargs):
-        user = request.user
+        params = request.query_params
         try:
-            year = int(request.query_params.get("year", timezone.localdate().year))
-            month = int(request.query_params.get("month", timezone.localdate().month))
-        except (ValueError, TypeError):
-            year, month = timezone.localdate().year, timezone.localdate().month
-
-        spent_subquery = (
-            Transaction.objects.filter(
-                category=OuterRef("category"),
-                user=OuterRef("user"),
-                date__gte=OuterRef("start_date"),
-                date__lte=OuterRef("end_date"),
+            end = (
+                datetime.date.fromisoformat(params["end"])
+                if params.get("end")
+                else timezone.localdate()
             )
-            .order_by()
-            .values("category")
-            .annotate(total=Sum("amount"))
-            .values("total")
-        )
-
-        budgets = Budget.objects.filter(
-            user=user,
-            start_date__year__lte=year,
-            end_date__year__gte=year,
-            start_date__month__lte=month,
-            end_date__month__gte=month,
-        ).annotate(
-            spent=Coalesce(
-                Subquery(spent_subquery, output_field=DecimalField()), Decimal("0.00")
+            start = (
+                datetime.date.fromisoformat(params["start"])
+                if params.get("start")
+                else end - datetime.timedelta(days=364)
             )
-        )
+        except (ValueError, OverflowError):
+            return Response({"error": "Invalid date format."}, status=400)
+        if start > end:
+            return Response({"error": "start must not be after end."}, status=400)
+        if (end - start).days >= MAX_HISTORY_DAYS:
+            return Response({"error": "Date range is too long."}, status=400)
 
-        serializer = BudgetSerializer(budgets, many=True)
-        print(serializer.data)
-        return Response(serializer.data)
+        accounts = Account.objects.filter(user=request.user).order_by("name")
+        account = params.get("account")
+        if account:
+            if not account.isdigit():
+                return Response({"error": "Invalid account id."}, status=400)
+            accounts = accounts.filter(pk=int(account))
+        accounts = list(accounts)
+
+        series, dates = balance_series(accounts, start, end)
+        totals = [sum(day, Decimal("0.00")) for day in zip(*series.values())]
+        return Response(
+            {
+                "start": start,
+                "end": end,
+                "accounts": [
+                    {
+                        "id": account.pk,
+                        "name": account.name,
+                        "series": [
+                            {"date": date, "balance": balance}
+                            for date, balance in zip(dates, series[account.pk])
+                        ],
+                    }
+                    for account in accounts
+                ],
+                "total": [
+                    {"date": date, "balance": balance}
+                    for date, balance in zip(dates, totals)
+                ],
+            }
+        )
 
 
-class SpendingByCategoryAnalyticsView(APIView):
+class TrendAnalyticsView(DataVersionETagMixin, APIView):
     """
-    Provides spending breakdown by category for the specified month.
+    Income, expense and net per month, week or day over a range of months,
+    for multi-month charts in one request.
+    Query params: from, to (YYYY-MM; default the last 12 months) and
+    granularity (month, week or day; default month).
     """
 
     permission_classes = [permissions.IsAuthenticated]
 
+    @cached_analytics("trend")
     def get(self, request, *args, **kwargs):
-        user = request.user
+        params = request.query_params
+        granularity = params.get("granularity", "month")
+        if granularity not in GRANULARITIES:
+            return Response(
+                {"error": f"granularity must be one of {', '.join(GRANULARITIES)}."},
+                status=400,
+            )
         try:
-            year = int(request.query_params.get("year", timezone.now().year))
-            month = int(request.query_params.get("month", timezone.now().month))
-        except (ValueError, TypeError):
-            return Response({"error": "Invalid year or month format."}, status=400)
-
-        start_of_month = datetime.date(year, month, 1)
-        _, last_day = calendar.monthrange(year, month)
-        end_of_month = datetime.date(year, month, last_day)
-
-        spending_data = (
-            Transaction.objects.filter(
-                user=user,
-                date__range=[start_of_month, end_of_month],
-                category__type="expense",
+            today = timezone.localdate()
+            last = (
+                datetime.datetime.strptime(params["to"], "%Y-%m").date()
+                if params.get("to")
+                else today.replace(day=1)
             )
-            .values("category__name", "category__color", "date")
-            .annotate(amount=Sum("amount"))
-            .order_by("-amount")
-        )
+            start = (
+                datetime.datetime.strptime(params["from"], "%Y-%m").date()
+                if params.get("from")
+                else (last - datetime.timedelta(days=334)).replace(day=1)
+            )
+        except (ValueError, OverflowError):
+            return Response({"error": "Invalid month format, use YYYY-MM."}, status=400)
+        end = month_end(last)
+        if start > end:
+            return Response({"error": "from must not be after to."}, status=400)
+        if bucket_count(start, end, granularity) > MAX_BUCKETS:
+            return Response({"error": "Too many buckets requested."}, status=400)
 
-        formatted_data = [
+        return Response(
             {
-                "fullName": item["category__name"] or "Uncategorized",
-                "name": (
-                    item["category__name"]
-                    if len(item["category__name"]) < 10
-                    else f'{item["category__name"][:10]}...'
-                ),
-                "amount": item["amount"],
-                "color": item["category__color"] or "#cccccc",
-                "legendFontColor": "#7F7F7F",
-                "legendFontSize": 12,
-                "date": item["date"],
+                "from": start.strftime("%Y-%m"),
+                "to": last.strftime("%Y-%m"),
+                "granularity": granularity,
+                "buckets": cash_flow_trend(request.user, start, end, granularity),
             }
-            for item in spending_data
-        ]
-
-        return Response(formatted_data)
+        )
 
 
-class RecentTransactionsView(APIView):
+class ForecastAnalyticsView(DataVersionETagMixin, APIView):
     """
-    Returns the 5 most recent transactions for the dashboard.
+    Projected end-of-month balances per account and in total, from the
+    current balances and the user's recurring transactions.
+    Query params: months (1-60; default 6), counted from the current month.
     """
 
     permission_classes = [permissions.IsAuthenticated]
 
+    @cached_analytics("forecast")
     def get(self, request, *args, **kwargs):
-        user = request.user
-        transactions = Transaction.objects.filter(user=user).order_by(
-            "-date", "-created_at"
-        )[:5]
-        serializer = TransactionSerializer(transactions, many=True)
-        return Response(serializer.data)
+        months = request.query_params.get("months", str(DEFAULT_FORECAST_MONTHS))
+        if not months.isdigit() or not 1 <= int(months) <= MAX_FORECAST_MONTHS:
+            return Response(
+                {"error": f"months must be between 1 and {MAX_FORECAST_MONTHS}."},
+                status=400,
+            )
+        month_starts, forecast = forecast_balances(request.user, int(months))
+        labels = [month.strftime("%Y-%m") for month in month_starts]
+        totals = [
+            sum(month, Decimal("0.00"))
+            for month in zip(*(series for _, _, series in forecast.values()))
+        ]
+        return Response(
+            {
+                "months": int(months),
+                "accounts": [
+                    {
+                        "id": pk,
+                        "name": name,
+                        "balance": balance,
+                        "series": [
+                            {"month": label, "balance": projected}
+                            for label, projected in zip(labels, series)
+                        ],
+                    }
+                    for pk, (name, balance, series) in forecast.items()
+                ],
+                "total": [
+                    {"month": label, "balance": projected}
+                    for label, projected in zip(labels, totals)
+                ],
+            }
+        )
@@ -0,0 +1,344 @@
+# backend/finance/backup.py
+import gzip
+import json
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DatabaseError, transaction
+from django.db.models import Q
+from django.utils import timezone
+from .balances import derive_opening_balances
+from .ledger import BULK_BATCH_SIZE
+from .models import Account, Budget, Category, RecurringTransaction, Transaction
+from .rollups import rebuild_monthly_totals
+from .snapshots import rebuild_snapshots
+from .versioning import bump_data_version
+
+ARCHIVE_FORMAT = "quanta-backup"
+# 2: accounts carry opening_balance
+ARCHIVE_VERSION = 2
+
+# (section, model, exported columns). Foreign keys are exported as the
+# source database ids and remapped on restore; sections are written in
+# dependency order so every id is known before it is referenced.
+SECTIONS = (
+    (
+        "accounts",
+        Account,
+        [
+            "id",
+            "name",
+            "account_type",
+            "currency",
+            "balance",
+            "opening_balance",
+            "created_at",
+        ],
+    ),
+    ("categories", Category, ["id", "name", "type", "color", "system"]),
+    (
+        "transactions",
+        Transaction,
+        ["account", "category", "amount", "date", "notes", "created_at"],
+    ),
+    (
+        "budgets",
+        Budget,
+        ["category", "amount", "start_date", "end_date", "created_at"],
+    ),
+    (
+        "recurring_transactions",
+        RecurringTransaction,
+        [
+            "account",
+            "category",
+            "amount",
+            "notes",
+            "start_date",
+            "next_date",
+            "frequency",
+        ],
+    ),
+)
+
+
+SECTION_COLUMNS = {name: set(columns) for name, _, columns in SECTIONS}
+
+
+class RestoreError(ValueError):
+    pass
+
+
+def _dumps(value):
+    return json.dumps(value, cls=DjangoJSONEncoder, separators=(",", ":")) + "\n"
+
+
+def _section_rows(user, name, model, columns):
+    if name == "categories":
+        # the user's own categories plus any system category they use
+        used = (
+            Q(transactions__user=user)
+            | Q(budgets__user=user)
+            | Q(recurringtransaction__user=user)
+        )
+        queryset = (
+            Category.objects.filter(Q(user=user) | (Q(user__isnull=True) & used))
+            .distinct()
+            .values_list("id", "name", "type", "color", "user_id")
+        )
+        for id_, cat_name, type_, color, owner in queryset.iterator():
+            yield [id_, cat_name, type_, color, owner is None]
+        return
+
+    attnames = [model._meta.get_field(c).attname for c in columns]
+    queryset = model.objects.filter(user=user).order_by("pk").values_list(*attnames)
+    yield from queryset.iterator(chunk_size=BULK_BATCH_SIZE)
+
+
+def iter_archive_lines(user):
+    """
+    Yield a user's finance data as JSON lines: a header, then for every
+    section a {"section", "fields"} line followed by one array per row.
+    Rows are read through server-side cursors, so memory stays flat.
+    """
+    yield _dumps(
+        {
+            "format": ARCHIVE_FORMAT,
+            "version": ARCHIVE_VERSION,
+            "created_at": timezone.now(),
+            "user": user.get_username(),
+        }
+    )
+    for name, model, columns in SECTIONS:
+        yield _dumps({"section": name, "fields": columns})
+        for row in _section_rows(user, name, model, columns):
+            yield _dumps(list(row))
+
+
+def _check_header(line):
+    try:
+        header = json.loads(line)
+    except ValueError:
+        raise RestoreError("Not a backup archive.")
+    if not isinstance(header, dict) or header.get("format") != ARCHIVE_FORMAT:
+        raise RestoreError("Not a backup archive.")
+    version = header.get("version", 0)
+    if not isinstance(version, int):
+        raise RestoreError("Not a backup archive.")
+    if version > ARCHIVE_VERSION:
+        raise RestoreError(f"Unsupported archive version {version}.")
+
+
+def _section_header(item):
+    """The (section, fields) of a section line, checked against SECTIONS."""
+    section, fields = item.get("section"), item.get("fields")
+    if section not in SECTION_COLUMNS:
+        raise RestoreError(f"Unknown archive section {section!r}.")
+    if not isinstance(fields, list) or not all(
+        isinstance(field, str) and field in SECTION_COLUMNS[section] for field in fields
+    ):
+        raise RestoreError(f"Invalid fields for section {section!r}.")
+    return section, fields
+
+
+def _parse_archive(lines):
+    """Yield (section, row dict) pairs after checking the header."""
+    lines = iter(lines)
+    _check_header(next(lines, ""))
+
+    section = fields = None
+    for line in lines:
+        if not line.strip():
+            continue
+        item = json.loads(line)
+        if isinstance(item, dict):
+            section, fields = _section_header(item)
+            continue
+        if section is None:
+            raise RestoreError("Row found before any section header.")
+        if not isinstance(item, list) or len(item) != len(fields):
+            raise RestoreError(f"Malformed row in section {section!r}.")
+        yield section, dict(zip(fields, item))
+
+
+def _to_python(model, data, skip=()):
+    return {
+        name: model._meta.get_field(name).to_python(value)
+        for name, value in data.items()
+        if name not in skip
+    }
+
+
+def has_finance_data(user):
+    return (
+        Account.objects.filter(user=user).exists()
+        or Budget.objects.filter(user=user).exists()
+        or RecurringTransaction.objects.filter(user=user).exists()
+    )
+
+
+def delete_finance_data(user):
+    """
+    Delete a user's finance data ahead of a restore. Transactions go in
+    one raw DELETE, skipping the per-row delete signals: balances,
+    snapshots, rollups and caches are all rebuilt by the restore anyway.
+    """
+    transactions = Transaction.objects.filter(user=user)
+    transactions._raw_delete(transactions.db)
+    RecurringTransaction.objects.filter(user=user).delete()
+    Budget.objects.filter(user=user).delete()
+    Account.objects.filter(user=user).delete()
+
+
+class _Restore:
+    """Buffers archive rows per section and bulk inserts them in batches."""
+
+    def __init__(self, user, batch_size):
+        self.user = user
+        self.batch_size = batch_size
+        # source id -> new id, for the sections other rows point at
+        self.ids = {"accounts": {}, "categories": {}}
+        self.counts = {name: 0 for name, _, _ in SECTIONS}
+        self.pending = []
+        self.section = None
+        self.user_categories = {c.name: c for c in Category.objects.filter(user=user)}
+        self.system_categories = {
+            c.name: c for c in Category.objects.filter(user__isnull=True)
+        }
+
+    def add(self, section, data):
+        if section != self.section or len(self.pending) >= self.batch_size:
+            self.flush()
+            self.section = section
+        build = getattr(self, f"_build_{section}")
+        try:
+            self.pending.append(build(data))
+        except RestoreError:
+            raise
+        except (KeyError, TypeError, ValueError, ValidationError) as e:
+            raise RestoreError(f"Invalid row in section {section!r}: {e!r}")
+
+    def flush(self):
+        """Insert the pending (source id, object) pairs of the current section."""
+        if not self.pending:
+            return
+        # dict keyed on identity: two source categories may share one new row
+        new = list(
+            {id(obj): obj for _, obj in self.pending if obj._state.adding}.values()
+        )
+        if new:
+            type(new[0]).objects.bulk_create(new, batch_size=self.batch_size)
+        if self.section in self.ids:
+            self.ids[self.section].update(
+                (source_id, obj.pk) for source_id, obj in self.pending
+            )
+        self.counts[self.section] += len(self.pending)
+        self.pending = []
+
+    def _ref(self, section, source_id, required=False):
+        if source_id is None:
+            if required:
+                raise RestoreError(f"Archive row is missing its {section} reference.")
+            return None
+        try:
+            return self.ids[section][source_id]
+        except KeyError:
+            raise RestoreError(f"Archive references unknown {section} id {source_id}.")
+
+    def _build_accounts(self, data):
+        # balances are restored as stored, not replayed from transactions
+        account = Account(user=self.user, **_to_python(Account, data, skip=("id",)))
+        return data["id"], account
+
+    def _build_categories(self, data):
+        name = data["name"]
+        existing = self.user_categories.get(name)
+        if data.get("system"):
+            existing = self.system_categories.get(name, existing)
+        if existing is None:
+            existing = Category(
+                user=self.user, **_to_python(Category, data, skip=("id", "system"))
+            )
+            self.user_categories[name] = existing
+        return data["id"], existing
+
+    def _build_transactions(self, data):
+        tx = Transaction(
+            user=self.user,
+            account_id=self._ref("accounts", data.pop("account", None), True),
+            category_id=self._ref("categories", data.pop("category", None)),
+            **_to_python(Transaction, data),
+        )
+        tx.fingerprint = tx.compute_fingerprint()
+        return None, tx
+
+    def _build_budgets(self, data):
+        budget = Budget(
+            user=self.user,
+            category_id=self._ref("categories", data.pop("category", None)),
+            **_to_python(Budget, data),
+        )
+        return None, budget
+
+    def _build_recurring_transactions(self, data):
+        rule = RecurringTransaction(
+            user=self.user,
+            account_id=self._ref("accounts", data.pop("account", None), True),
+            category_id=self._ref("categories", data.pop("category", None)),
+            **_to_python(RecurringTransaction, data),
+        )
+        return None, rule
+
+
+def restore_archive(user, lines, replace=False, batch_size=BULK_BATCH_SIZE):
+    """
+    Restore an archive written by iter_archive_lines into `user`'s account.
+
+    Everything is inserted with bulk_create and ids are remapped on the
+    way in; account balances are taken from the archive instead of being
+    replayed through the per-row signals. Categories are matched by name
+    with the user's own (or, for system ones, the shared) categories.
+    Refuses to touch a user who already has finance data unless `replace`
+    is set, in which case that data is deleted first. All or nothing.
+    """
+    try:
+        with transaction.atomic():
+            return _restore(user, lines, replace, batch_size)
+    except RestoreError:
+        raise
+    except (DatabaseError, ValueError) as e:
+        # e.g. psycopg refuses NUL characters with a ValueError
+        raise RestoreError(f"Archive data was rejected: {e}")
+
+
+def _restore(user, lines, replace, batch_size):
+    if has_finance_data(user):
+        if not replace:
+            raise RestoreError("User already has finance data.")
+        delete_finance_data(user)
+
+    restore = _Restore(user, batch_size)
+    for section, data in _parse_archive(lines):
+        restore.add(section, data)
+    restore.flush()
+    # version 1 archives have no opening balances; work them out
+    account_ids = list(restore.ids["accounts"].values())
+    derive_opening_balances(account_ids)
+    rebuild_snapshots(account_ids)
+    rebuild_monthly_totals(user_ids=[user.pk])
+    bump_data_version(user.pk)
+    return restore.counts
+
+
+def write_archive(user, fileobj):
+    """Write a gzip-compressed archive of `user`'s data to a binary file."""
+    with gzip.open(fileobj, "wt", encoding="utf-8") as archive:
+        archive.writelines(iter_archive_lines(user))
+
+
+def read_archive(user, fileobj, replace=False):
+    """Restore a gzip-compressed archive from a binary file."""
+    try:
+        with gzip.open(fileobj, "rt", encoding="utf-8") as archive:
+            return restore_archive(user, archive, replace=replace)
+    except (OSError, EOFError, UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise RestoreError(f"Could not read archive: {e}")
@@ -0,0 +1,131 @@
+# backend/finance/balances.py
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from decimal import Decimal
+from django.db import connections, transaction
+from django.db.models import Case, F, Sum, When
+from .models import Account, Category, Transaction
+from .versioning import bump_data_version
+
+logger = logging.getLogger(__name__)
+
+RECONCILE_CHUNK_SIZE = 2000
+
+
+def effect_expression(prefix=""):
+    """
+    SQL version of signals._transaction_effect: expenses count negative,
+    income and uncategorized transactions positive.
+    `prefix` points at a transaction relation, e.g. "transactions__".
+    """
+    return Case(
+        When(
+            **{f"{prefix}category__type": Category.TYPE_EXPENSE},
+            then=-F(f"{prefix}amount"),
+        ),
+        default=F(f"{prefix}amount"),
+    )
+
+
+def transaction_totals(account_ids):
+    """
+    Net effect of all transactions per account, as {account_id: Decimal},
+    computed with one grouped aggregate over Transaction joined to Category.
+    """
+    rows = (
+        Transaction.objects.filter(account_id__in=account_ids)
+        .order_by()
+        .values("account_id")
+        .annotate(total=Sum(effect_expression()))
+        .values_list("account_id", "total")
+    )
+    return dict(rows)
+
+
+@dataclass
+class Drift:
+    account_id: int
+    user_id: int
+    name: str
+    stored: Decimal
+    expected: Decimal
+
+    @property
+    def amount(self):
+        return self.stored - self.expected
+
+
+def reconcile_accounts(account_ids, fix=False):
+    """
+    Compare stored and recomputed balances for a chunk of accounts.
+    With `fix`, the account rows are locked for the duration and drifted
+    balances are corrected with a relative F() update.
+    Returns the list of Drift records found.
+    """
+    with transaction.atomic():
+        accounts = Account.objects.filter(pk__in=account_ids).order_by("pk")
+        if fix:
+            accounts = accounts.select_for_update()
+        stored = list(
+            accounts.values_list("pk", "user_id", "name", "balance", "opening_balance")
+        )
+        totals = transaction_totals(account_ids)
+
+        drifts = []
+        for pk, user_id, name, balance, opening in stored:
+            expected = (opening or Decimal("0.00")) + totals.get(pk, Decimal("0.00"))
+            if balance != expected:
+                drifts.append(Drift(pk, user_id, name, balance, expected))
+
+        if fix:
+            for drift in drifts:
+                Account.objects.filter(pk=drift.account_id).update(
+                    balance=F("balance") - drift.amount
+                )
+                bump_data_version(drift.user_id)
+    return drifts
+
+
+def _reconcile_in_thread(account_ids, fix):
+    try:
+        return reconcile_accounts(account_ids, fix=fix)
+    finally:
+        # connections are per thread; don't leak one per finished chunk
+        connections.close_all()
+
+
+def reconcile_balances(
+    queryset=None, fix=False, workers=1, chunk_size=RECONCILE_CHUNK_SIZE
+):
+    """
+    Recompute every account's balance from its opening balance and
+    transactions, in chunks of `chunk_size` accounts spread over `workers`
+    threads (each with its own database connection).
+    Yields Drift records as chunks complete.
+    """
+    queryset = Account.objects.all() if queryset is None else queryset
+    ids = list(queryset.order_by("pk").values_list("pk", flat=True))
+    chunks = [ids[i : i + chunk_size] for i in range(0, len(ids), chunk_size)]
+
+    if workers <= 1:
+        for chunk in chunks:
+            yield from reconcile_accounts(chunk, fix=fix)
+        return
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for drifts in pool.map(lambda chunk: _reconcile_in_thread(chunk, fix), chunks):
+            yield from drifts
+
+
+def derive_opening_balances(account_ids):
+    """
+    Fill in opening_balance for accounts that lack one (e.g. rows written
+    with bulk_create) as their stored balance minus their transactions.
+    """
+    totals = transaction_totals(account_ids)
+    accounts = Account.objects.filter(pk__in=account_ids, opening_balance__isnull=True)
+    for pk, balance in accounts.values_list("pk", "balance"):
+        Account.objects.filter(pk=pk).update(
+            opening_balance=balance - totals.get(pk, Decimal("0.00"))
+        )
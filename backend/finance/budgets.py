@@ -0,0 +1,59 @@
+# backend/finance/budgets.py
+from decimal import Decimal
+from django.db.models import F, FilteredRelation, Q, Sum
+from django.db.models.functions import Coalesce
+from .models import Budget
+
+ZERO = Decimal("0.00")
+
+
+def overlapping(queryset, start, end):
+    """Budgets whose [start_date, end_date] overlaps [start, end]."""
+    return queryset.filter(start_date__lte=end, end_date__gte=start)
+
+
+def with_spent(queryset):
+    """
+    Annotate `spent`: the sum of the owner's transactions in the budget's
+    category and date range. The conditions go in the JOIN, so every
+    budget of the queryset is evaluated by one grouped query.
+    """
+    return queryset.annotate(
+        period_transactions=FilteredRelation(
+            "category__transactions",
+            condition=Q(
+                category__transactions__user=F("user"),
+                category__transactions__date__gte=F("start_date"),
+                category__transactions__date__lte=F("end_date"),
+            ),
+        ),
+        spent=Coalesce(Sum("period_transactions__amount"), ZERO),
+    )
+
+
+def evaluate_budgets(user, start, end):
+    """The user's budgets overlapping [start, end], with `spent`."""
+    queryset = overlapping(Budget.objects.filter(user=user), start, end)
+    return list(with_spent(queryset).select_related("category"))
+
+
+def evaluate_periods(user, periods):
+    """
+    Evaluate the budgets of several (start, end) periods at once, e.g. the
+    twelve months of a year, with a single query over their union.
+    Returns {period: [budgets overlapping it]}.
+    """
+    periods = list(periods)
+    if not periods:
+        return {}
+    budgets = evaluate_budgets(
+        user, min(start for start, _ in periods), max(end for _, end in periods)
+    )
+    return {
+        (start, end): [
+            budget
+            for budget in budgets
+            if budget.start_date <= end and budget.end_date >= start
+        ]
+        for start, end in periods
+    }
@@ -0,0 +1,175 @@
+# backend/finance/cache.py
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from urllib.parse import urlencode
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+from rest_framework.response import Response
+from .versioning import data_version
+
+_MISSING = object()
+
+
+class AnalyticsCache:
+    """
+    Memoizes analytics results in one of Django's caches (locmem, file or
+    any other backend), under keys namespaced by view name, user, the
+    user's data version and the request parameters. Any write to the
+    user's data bumps the version, so stale entries are never read again.
+
+    On top of the backend it adds:
+    - a bound of `max_entries` per process, evicting the least recently
+      used keys this process wrote (the backend's own culling is a
+      backstop);
+    - single flight: concurrent misses for one key compute it once, the
+      others wait for the result (threads via a lock, other processes via
+      a cache.add() lock entry);
+    - hit/miss/eviction counters for this process, see stats().
+    """
+
+    def __init__(
+        self,
+        alias="default",
+        namespace="finance:analytics",
+        max_entries=1000,
+        timeout=300,
+        lock_timeout=10,
+    ):
+        self.alias = alias
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self.lock_timeout = lock_timeout
+        self._lock = threading.Lock()
+        self._recent = OrderedDict()
+        self._inflight = {}
+        self._counters = {"hits": 0, "misses": 0, "evictions": 0}
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def make_key(self, name, user_id, version, params=None):
+        items = sorted(params.lists()) if hasattr(params, "lists") else params or {}
+        digest = hashlib.sha1(
+            urlencode(sorted(dict(items).items()), doseq=True).encode("utf-8")
+        ).hexdigest()[:16]
+        return f"{self.namespace}:{name}:{user_id}:{version}:{digest}"
+
+    def stats(self):
+        with self._lock:
+            return {**self._counters, "entries": len(self._recent)}
+
+    def _count(self, counter, n=1):
+        with self._lock:
+            self._counters[counter] += n
+
+    def _touch(self, key):
+        """Mark `key` most recently used and evict past max_entries."""
+        with self._lock:
+            self._recent[key] = None
+            self._recent.move_to_end(key)
+            evicted = []
+            while len(self._recent) > self.max_entries:
+                evicted.append(self._recent.popitem(last=False)[0])
+            self._counters["evictions"] += len(evicted)
+        if evicted:
+            self.cache.delete_many(evicted)
+
+    def _hit(self, key, value):
+        self._count("hits")
+        self._touch(key)
+        return value, True
+
+    def _wait_for_other_process(self, key):
+        deadline = time.monotonic() + self.lock_timeout
+        while time.monotonic() < deadline:
+            time.sleep(0.05)
+            value = self.cache.get(key, _MISSING)
+            if value is not _MISSING:
+                return value
+        return _MISSING
+
+    def get_or_compute(self, key, compute):
+        """
+        Return (value, hit). `compute` returns (value, cacheable); values
+        that are not cacheable are handed back without being stored.
+        """
+        value = self.cache.get(key, _MISSING)
+        if value is not _MISSING:
+            return self._hit(key, value)
+
+        with self._lock:
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = threading.Event()
+        if not leader:
+            flight.wait(self.lock_timeout)
+            value = self.cache.get(key, _MISSING)
+            if value is not _MISSING:
+                return self._hit(key, value)
+
+        lock_key = f"{key}:lock"
+        try:
+            if leader and not self.cache.add(lock_key, 1, self.lock_timeout):
+                value = self._wait_for_other_process(key)
+                if value is not _MISSING:
+                    return self._hit(key, value)
+            self._count("misses")
+            value, cacheable = compute()
+            if cacheable:
+                self.cache.set(key, value, self.timeout)
+                self._touch(key)
+            return value, False
+        finally:
+            if leader:
+                self.cache.delete(lock_key)
+                with self._lock:
+                    del self._inflight[key]
+                flight.set()
+
+
+analytics_cache = AnalyticsCache(**getattr(settings, "FINANCE_ANALYTICS_CACHE", {}))
+
+
+def cached_analytics(name, cache=None):
+    """
+    Decorator for an analytics view's get(): serve the response data from
+    `cache` (the module's analytics_cache by default) when the same user,
+    at the same data version and day, asked with the same parameters.
+    Only 200 responses are stored. Adds an X-Analytics-Cache: hit|miss
+    header.
+    """
+
+    def decorator(method):
+        @wraps(method)
+        def wrapper(view, request, *args, **kwargs):
+            store = cache or analytics_cache
+            version = getattr(view, "data_version", None)
+            if version is None:
+                version = data_version(request.user)
+            key = store.make_key(
+                name,
+                request.user.pk,
+                f"{version}.{timezone.localdate():%Y%m%d}",
+                request.query_params,
+            )
+            own = {}
+
+            def compute():
+                response = own["response"] = method(view, request, *args, **kwargs)
+                return response.data, response.status_code == 200
+
+            data, hit = store.get_or_compute(key, compute)
+            response = own.get("response") or Response(data)
+            response["X-Analytics-Cache"] = "hit" if hit else "miss"
+            return response
+
+        return wrapper
+
+    return decorator
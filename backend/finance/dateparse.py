@@ -0,0 +1,113 @@
+# backend/finance/dateparse.py
+import datetime
+from functools import lru_cache
+
+DATE_FORMATS = ("%Y-%m-%d", "%d-%m-%Y", "%d/%m/%Y", "%m/%d/%Y")
+ISO_FORMAT = DATE_FORMATS[0]
+
+
+def _parse_with(value, fmt):
+    # date.fromisoformat is several times faster than strptime, but also
+    # accepts forms like "20250101"; only hand it the strict shape and let
+    # strptime handle the rest (e.g. unpadded "2025-1-5").
+    if fmt == ISO_FORMAT and len(value) == 10 and value[4] == "-" and value[7] == "-":
+        return datetime.date.fromisoformat(value)
+    return datetime.datetime.strptime(value, fmt).date()
+
+
+def _first_match(values, formats):
+    """The first of `values` that every one of `formats` reads."""
+    for value in values:
+        try:
+            for fmt in formats:
+                _parse_with(value, fmt)
+        except ValueError:
+            continue
+        return value
+    return None
+
+
+def parse_date(s):
+    """
+    Parse a single date string, trying every known format in turn.
+    Returns None if none of them match. Fine for one-off values; use a
+    DateParser for whole files.
+    """
+    s = s.strip()
+    for fmt in DATE_FORMATS:
+        try:
+            return _parse_with(s, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+class AmbiguousDateFormat(ValueError):
+    """Several formats read every sampled date, so the order is unknown."""
+
+    def __init__(self, formats, example=None):
+        self.formats = formats
+        self.example = example
+        super().__init__(
+            f"Cannot tell whether dates such as {example!r} are "
+            + " or ".join(formats)
+            + "; no date in the file tells them apart."
+        )
+
+
+class DateParser:
+    """
+    Date parser for a column of dates that share one format.
+
+    `DateParser.sniff(samples)` picks the format from a sample of values;
+    `parse()` then accepts only that format, so a file is never read with
+    mixed day/month orders. A sample that fits several formats equally
+    well raises AmbiguousDateFormat rather than guessing. Without a format every known one is tried.
+    Results are memoized, since bank statements repeat the same few dates
+    over and over.
+    """
+
+    def __init__(self, fmt=None, formats=DATE_FORMATS, cache_size=4096):
+        self.format = fmt
+        self._formats = (fmt,) if fmt else formats
+        self.parse = lru_cache(maxsize=cache_size)(self._parse)
+
+    @classmethod
+    def sniff(cls, samples, formats=DATE_FORMATS, **kwargs):
+        """
+        Build a parser using the format that matches the most sample values.
+        Raises AmbiguousDateFormat when several formats tie, e.g. day/month
+        and month/day on a sample whose days are all 12 or less; its
+        `formats` are the tied ones, to narrow down with more samples.
+        """
+        values = [v.strip() for v in samples if v and v.strip()]
+        best, best_hits = [], 0
+        for fmt in formats:
+            hits = 0
+            for value in values:
+                try:
+                    _parse_with(value, fmt)
+                    hits += 1
+                except ValueError:
+                    pass
+            if hits > best_hits:
+                best, best_hits = [fmt], hits
+            elif hits and hits == best_hits:
+                best.append(fmt)
+        if len(best) > 1:
+            raise AmbiguousDateFormat(tuple(best), _first_match(values, best))
+        return cls(best[0] if best else None, formats=formats, **kwargs)
+
+    def _parse(self, value):
+        value = value.strip()
+        for fmt in self._formats:
+            try:
+                return _parse_with(value, fmt)
+            except ValueError:
+                continue
+        if self.format:
+            raise ValueError(f"Date {value!r} does not match the file's format")
+        raise ValueError(f"Unrecognized date: {value!r}")
+
+    def cache_info(self):
+        return self.parse.cache_info()
@@ -0,0 +1,154 @@
+# backend/finance/forecast.py
+from decimal import Decimal
+import numpy as np
+from django.utils import timezone
+from .models import Account, Category, RecurringTransaction
+
+DEFAULT_FORECAST_MONTHS = 6
+MAX_FORECAST_MONTHS = 60
+
+_STEP_DAYS = {
+    RecurringTransaction.FREQ_DAILY: 1,
+    RecurringTransaction.FREQ_WEEKLY: 7,
+}
+
+
+def _month_index(dates):
+    """Months since 1970-01 of a datetime64[D] array (or scalar)."""
+    return np.asarray(dates).astype("datetime64[M]").astype(np.int64)
+
+
+def _month_first(months):
+    return np.asarray(months).astype("datetime64[M]").astype("datetime64[D]")
+
+
+def _segments(counts):
+    """
+    For rules with `counts` occurrences each, the rule index and the
+    occurrence number (0, 1, ...) of every occurrence, flattened.
+    """
+    rule_idx = np.repeat(np.arange(len(counts)), counts)
+    starts = np.repeat(np.cumsum(counts) - counts, counts)
+    return rule_idx, np.arange(len(rule_idx)) - starts
+
+
+def expand_fixed_step(starts, step_days, end):
+    """
+    Every occurrence up to `end` of rules first due on `starts`
+    (datetime64[D] array) and repeating every `step_days` days.
+    Returns (rule index, date) arrays.
+    """
+    counts = np.maximum((end - starts).astype(np.int64) // step_days + 1, 0)
+    rule_idx, k = _segments(counts)
+    return rule_idx, starts[rule_idx] + k * step_days
+
+
+def expand_monthly(starts, end):
+    """
+    Every occurrence up to `end` of monthly rules first due on `starts`.
+
+    Matches RecurringTransaction.advance_next_date, which clamps the day to
+    the length of each month it steps into and carries the clamped day on
+    (Jan 31 -> Feb 28 -> Mar 28): the day of the k-th occurrence is the
+    running minimum of the first day and the lengths of months 1..k.
+    """
+    start_months = _month_index(starts)
+    counts = np.maximum(_month_index(end) - start_months + 1, 0)
+    rule_idx, k = _segments(counts)
+    months = start_months[rule_idx] + k
+    first = _month_first(months)
+    month_length = (_month_first(months + 1) - first).astype(np.int64)
+    start_day = (starts - _month_first(start_months)).astype(np.int64) + 1
+    days = np.where(k == 0, start_day[rule_idx], month_length)
+    # a running minimum per rule: push every rule below all earlier ones
+    # (days are 1..31) so one flat accumulate restarts at each rule
+    shift = rule_idx * 64
+    days = np.minimum.accumulate(days - shift) + shift
+    dates = first + (days - 1)
+    keep = dates <= end
+    return rule_idx[keep], dates[keep]
+
+
+def expand_rules(starts, frequencies, end):
+    """
+    Expand rules of mixed frequency; returns (rule index, date) arrays.
+    `frequencies` is an array of RecurringTransaction.FREQ_* values.
+    """
+    rule_parts, date_parts = [], []
+    for frequency in np.unique(frequencies):
+        selected = np.flatnonzero(frequencies == frequency)
+        step = _STEP_DAYS.get(frequency)
+        if step is None:
+            rule_idx, dates = expand_monthly(starts[selected], end)
+        else:
+            rule_idx, dates = expand_fixed_step(starts[selected], step, end)
+        rule_parts.append(selected[rule_idx])
+        date_parts.append(dates)
+    if not rule_parts:
+        return np.array([], dtype=np.int64), np.array([], dtype="datetime64[D]")
+    return np.concatenate(rule_parts), np.concatenate(date_parts)
+
+
+def _cents(amount):
+    return int((amount * 100).to_integral_value())
+
+
+def forecast_balances(user, months=DEFAULT_FORECAST_MONTHS, today=None):
+    """
+    Projected end-of-month balance of each of the user's accounts for
+    `months` months starting with the current one: the current balance
+    plus every occurrence of the user's recurring rules from their
+    next_date on (including ones due but not posted yet). Read only.
+
+    Returns (month starts, {account_id: (name, balance, [balance per month])}).
+    """
+    today = today or timezone.localdate()
+    first_month = _month_index(np.datetime64(today, "D"))
+    end = _month_first(first_month + months) - np.timedelta64(1, "D")
+
+    accounts = list(
+        Account.objects.filter(user=user)
+        .order_by("name")
+        .values_list("pk", "name", "balance")
+    )
+    rows = {pk: row for row, (pk, _, _) in enumerate(accounts)}
+    rules = list(
+        RecurringTransaction.objects.filter(user=user, account_id__in=rows).values_list(
+            "account_id", "amount", "next_date", "frequency", "category__type"
+        )
+    )
+
+    totals = np.zeros((len(accounts), months), dtype=np.int64)
+    if rules:
+        account_ids, amounts, next_dates, frequencies, types = zip(*rules)
+        # effect in cents, signed as signals._transaction_effect does
+        effects = np.array(
+            [
+                -_cents(amount) if kind == Category.TYPE_EXPENSE else _cents(amount)
+                for amount, kind in zip(amounts, types)
+            ],
+            dtype=np.int64,
+        )
+        rule_rows = np.array([rows[pk] for pk in account_ids], dtype=np.int64)
+        rule_idx, dates = expand_rules(
+            np.array(next_dates, dtype="datetime64[D]"), np.array(frequencies), end
+        )
+        # occurrences already overdue land in the current month
+        buckets = np.clip(_month_index(dates) - first_month, 0, None)
+        np.add.at(totals, (rule_rows[rule_idx], buckets), effects[rule_idx])
+
+    balances = np.array([_cents(b) for _, _, b in accounts], dtype=np.int64)
+    projected = balances[:, None] + np.cumsum(totals, axis=1)
+
+    month_starts = [
+        d.item() for d in _month_first(first_month + np.arange(months, dtype=np.int64))
+    ]
+    forecast = {
+        pk: (
+            name,
+            balance,
+            [Decimal(int(c)).scaleb(-2) for c in projected[rows[pk]]],
+        )
+        for pk, name, balance in accounts
+    }
+    return month_starts, forecast
@@ -0,0 +1,499 @@
+# backend/finance/importers.py
+import codecs
+import csv
+import datetime
+import logging
+import random
+from itertools import chain, islice
+from decimal import Decimal, InvalidOperation
+from django.db import DatabaseError, transaction
+from django.db.models import F, Max, Q
+from django.utils import timezone
+from .dateparse import DATE_FORMATS, AmbiguousDateFormat, DateParser
+from .ledger import BULK_BATCH_SIZE, bulk_post_transactions
+from .models import Account, Category, ImportJob, Transaction
+
+logger = logging.getLogger(__name__)
+
+# Transaction.amount is DecimalField(max_digits=12, decimal_places=2)
+MAX_AMOUNT = Decimal("9999999999.99")
+CENT = Decimal("0.01")
+
+# rows committed per atomic block in streaming mode
+STREAM_CHUNK_SIZE = 5000
+# cap on per-row error entries kept in memory in streaming mode
+STREAM_MAX_ERRORS = 1000
+# rows read ahead to detect the file's date format, and how far the read
+# ahead may grow while the dates still fit several formats
+DATE_SNIFF_ROWS = 100
+DATE_SNIFF_MAX_ROWS = 10000
+# a running job that has not reported progress for this long is taken to
+# be orphaned by a worker that died mid-run
+IMPORT_JOB_TIMEOUT = datetime.timedelta(hours=2)
+
+
+def generate_random_color():
+    """Generates a random, visually appealing hex color."""
+    return f"#{random.randint(0, 0xFFFFFF):06x}"
+
+
+def parse_amount(value):
+    """
+    Parse a CSV amount such as "$1,234.50" into a Decimal.
+    Values the database column would reject raise here instead, so a bad
+    row is reported on its own rather than failing the whole batch insert.
+    """
+    try:
+        amount = Decimal(value.replace("$", "").replace(",", ""))
+    except InvalidOperation:
+        raise ValueError(f"Invalid amount: {value!r}")
+    if not amount.is_finite() or abs(amount.quantize(CENT)) > MAX_AMOUNT:
+        raise ValueError(f"Amount out of range: {value!r}")
+    return amount
+
+
+def clean_text(value, label):
+    """Reject text the database cannot store (Postgres refuses NUL)."""
+    if "\x00" in value:
+        raise ValueError(f"{label} contains a NUL character")
+    return value
+
+
+def iter_csv_rows(upload, encoding="utf-8"):
+    """
+    Lazily yield csv.DictReader rows from an uploaded file.
+    The upload is read line by line and decoded incrementally, so only the
+    current line is ever held in memory as text.
+    """
+    return csv.DictReader(codecs.iterdecode(upload, encoding))
+
+
+def chunked(iterable, size):
+    """Yield lists of at most `size` items from `iterable`."""
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+class TransactionImporter:
+    """
+    Set-based CSV importer for a single user.
+
+    Accounts and categories are resolved from in-memory lookup tables that
+    are loaded once per file; missing ones are created the first time they
+    are seen. Valid rows are inserted with batched bulk_create and the
+    balance of each account is adjusted once per batch.
+
+    `import_rows` commits the whole file or nothing; `import_stream` commits
+    fixed-size chunks independently, so a bad chunk only loses its own rows.
+
+    Rows whose fingerprint matches a transaction that existed before the
+    import started are counted as duplicates and not inserted again, so
+    re-uploading an overlapping statement is a no-op for the overlap.
+    """
+
+    def __init__(self, user, batch_size=BULK_BATCH_SIZE, max_errors=None):
+        self.user = user
+        self.batch_size = batch_size
+        self.max_errors = max_errors
+        self.created = 0
+        self.skipped = 0
+        self.duplicates = 0
+        self.errors = []
+        self.rows_processed = 0
+        self.chunks_committed = 0
+        self.chunks_failed = 0
+        self.chunk_errors = []
+        self._accounts = {
+            account.name: account for account in Account.objects.filter(user=user)
+        }
+        self._categories = self._load_categories()
+        self.date_parser = DateParser()
+        # Rows this import inserts get higher ids, so they are never
+        # mistaken for pre-existing duplicates of each other.
+        self._last_pk = Transaction.objects.filter(user=user).aggregate(last=Max("pk"))[
+            "last"
+        ]
+
+    def _load_categories(self):
+        # Mirrors the old per-row `name__iexact` lookup: the user's own
+        # category wins over a system one with the same name, so system
+        # categories (user_id NULL) are loaded first and then overwritten.
+        categories = Category.objects.filter(
+            Q(user=self.user) | Q(user__isnull=True)
+        ).order_by(F("user_id").asc(nulls_first=True))
+        return {category.name.lower(): category for category in categories}
+
+    def resolve_account(self, name):
+        account = self._accounts.get(name)
+        if account is None:
+            # savepoint, so a rejected name only fails this row
+            with transaction.atomic():
+                account, _ = Account.objects.get_or_create(
+                    name=name, user=self.user, defaults={"account_type": "bank"}
+                )
+            self._accounts[name] = account
+        return account
+
+    def resolve_category(self, name, category_type):
+        category = self._categories.get(name.lower())
+        if category is None:
+            with transaction.atomic():
+                category = Category.objects.create(
+                    name=name,
+                    user=self.user,
+                    type=category_type,
+                    color=generate_random_color(),
+                )
+            self._categories[name.lower()] = category
+        return category
+
+    def build_transaction(self, row):
+        """
+        Turn one CSV row into an unsaved Transaction.
+        Raises on bad data; the caller records the row as skipped.
+        """
+        row_cleaned = {k.lower().strip(): v for k, v in row.items()}
+        account_name = row_cleaned.get("account", "Imported Account")
+        category_name = row_cleaned.get("category", "Uncategorized")
+        # Look for the 'category_type' column in the CSV. Default to 'expense'.
+        category_type = row_cleaned.get("category_type", "expense").lower()
+        if category_type not in ["income", "expense"]:
+            category_type = "expense"  # Sanitize the input
+
+        # Parse the values first so a bad row never creates an account
+        # or category as a side effect.
+        amount = parse_amount(row_cleaned.get("amount", "0"))
+        date = self.date_parser.parse(row_cleaned.get("date"))
+        notes = clean_text(row_cleaned.get("notes") or "", "Notes")
+        clean_text(account_name, "Account name")
+        clean_text(category_name, "Category name")
+
+        return Transaction(
+            user=self.user,
+            account=self.resolve_account(account_name),
+            category=self.resolve_category(category_name, category_type),
+            amount=amount,
+            date=date,
+            notes=notes,
+        )
+
+    def record_error(self, row_number, row, error):
+        error_detail = (
+            f"Row {row_number} skipped due to a data error: {error}. Row data: {row}"
+        )
+        logger.warning(error_detail)
+        if self.max_errors is None or len(self.errors) < self.max_errors:
+            self.errors.append({"row": row_number, "data": row, "error": str(error)})
+        self.skipped += 1
+
+    def _post_rows(self, numbered_rows):
+        """Build and bulk insert (row_number, row) pairs; returns rows created."""
+        pending = []
+        for i, row in numbered_rows:
+            try:
+                pending.append((i, row, self.build_transaction(row)))
+            except Exception as e:
+                self.record_error(i, row, e)
+        fresh = {id(tx) for tx in self._drop_duplicates([tx for _, _, tx in pending])}
+        pending = [item for item in pending if id(item[2]) in fresh]
+        try:
+            with transaction.atomic():
+                bulk_post_transactions(
+                    [tx for _, _, tx in pending], batch_size=self.batch_size
+                )
+        except (DatabaseError, ValueError):
+            # the database refused some row: find it one savepoint at a time
+            return self._post_one_by_one(pending)
+        return len(pending)
+
+    def _post_one_by_one(self, pending):
+        created = 0
+        for i, row, tx in pending:
+            # ids assigned by a rolled back batch are void
+            tx.pk = None
+            tx._state.adding = True
+            try:
+                with transaction.atomic():
+                    bulk_post_transactions([tx])
+            except (DatabaseError, ValueError) as e:
+                self.record_error(i, row, e)
+            else:
+                created += 1
+        return created
+
+    def _drop_duplicates(self, pending):
+        """Remove already-imported rows with one fingerprint lookup per batch."""
+        if not pending or self._last_pk is None:
+            return pending
+        for tx in pending:
+            tx.fingerprint = tx.compute_fingerprint()
+        existing = set(
+            Transaction.objects.filter(
+                user=self.user,
+                pk__lte=self._last_pk,
+                fingerprint__in={tx.fingerprint for tx in pending},
+            ).values_list("fingerprint", flat=True)
+        )
+        fresh = [tx for tx in pending if tx.fingerprint not in existing]
+        self.duplicates += len(pending) - len(fresh)
+        return fresh
+
+    def sniff_dates(self, rows):
+        """
+        Pipeline stage: read ahead DATE_SNIFF_ROWS rows to pick the file's
+        date format, then yield every row unchanged. While the dates read
+        so far fit several formats (01/05/2025 is both 1 May and 5 January)
+        the read-ahead keeps doubling, up to DATE_SNIFF_MAX_ROWS; a file
+        that is still ambiguous then raises AmbiguousDateFormat.
+        """
+        rows = iter(rows)
+        sample, formats, ambiguous = [], DATE_FORMATS, None
+        while True:
+            batch = list(islice(rows, max(DATE_SNIFF_ROWS, len(sample))))
+            sample += batch
+            try:
+                # earlier rows fit every tied format alike, so only the
+                # new rows can tell them apart
+                parser = DateParser.sniff(self._date_values(batch), formats=formats)
+            except AmbiguousDateFormat as e:
+                ambiguous, formats = e, e.formats
+            else:
+                if parser.format or ambiguous is None:
+                    self.date_parser = parser
+                    break
+            if not batch or len(sample) >= DATE_SNIFF_MAX_ROWS:
+                raise ambiguous
+        yield from chain(sample, rows)
+
+    @staticmethod
+    def _date_values(rows):
+        return [
+            value
+            for row in rows
+            for key, value in row.items()
+            if isinstance(key, str) and key.lower().strip() == "date"
+        ]
+
+    def import_rows(self, rows):
+        """
+        Import an iterable of csv.DictReader rows in one atomic block.
+        Rows are posted every `batch_size` rows, so memory stays flat.
+        """
+        created = 0
+        with transaction.atomic():
+            rows = self.sniff_dates(rows)
+            for chunk in chunked(enumerate(rows, 1), self.batch_size):
+                created += self._post_rows(chunk)
+        self.created += created
+        return self.summary()
+
+    def import_stream(self, rows, chunk_size=STREAM_CHUNK_SIZE, on_chunk=None):
+        """
+        Import rows in chunks of `chunk_size`, each in its own atomic block.
+
+        A chunk that fails at the database level is rolled back and counted
+        in `chunks_failed`; earlier chunks stay committed and later ones are
+        still attempted. A decoding error ends the stream, since nothing
+        after it can be read; AmbiguousDateFormat is raised before any
+        chunk is posted.
+        `on_chunk(importer)` is called after every chunk, e.g. to report
+        progress.
+        """
+        chunks = chunked(enumerate(self.sniff_dates(rows), 1), chunk_size)
+        number = 0
+        while True:
+            number += 1
+            try:
+                chunk = next(chunks, None)
+            except (UnicodeDecodeError, csv.Error) as e:
+                self._fail_chunk(number, None, e)
+                break
+            if chunk is None:
+                break
+            self._import_chunk(number, chunk)
+            self.rows_processed += len(chunk)
+            if on_chunk is not None:
+                on_chunk(self)
+        return self.summary()
+
+    def _import_chunk(self, number, chunk):
+        accounts, categories = dict(self._accounts), dict(self._categories)
+        skipped, duplicates, errors = self.skipped, self.duplicates, len(self.errors)
+        try:
+            with transaction.atomic():
+                created = self._post_rows(chunk)
+        except Exception as e:
+            # Anything created inside the rolled back block is gone, so the
+            # lookup tables go back to their state before this chunk.
+            self._accounts, self._categories = accounts, categories
+            self.skipped, self.duplicates = skipped, duplicates
+            self.errors = self.errors[:errors]
+            self._fail_chunk(number, chunk, e)
+            return
+        self.created += created
+        self.chunks_committed += 1
+
+    def _fail_chunk(self, number, chunk, error):
+        logger.warning(f"Import chunk {number} failed: {error}")
+        rows = [chunk[0][0], chunk[-1][0]] if chunk else None
+        self.chunk_errors.append({"chunk": number, "rows": rows, "error": str(error)})
+        self.skipped += len(chunk or ())
+        self.chunks_failed += 1
+
+    def summary(self):
+        return {
+            "created": self.created,
+            "skipped": self.skipped,
+            "duplicates": self.duplicates,
+            "errors": self.errors,
+        }
+
+    def stream_summary(self):
+        return {
+            **self.summary(),
+            "chunks": {
+                "committed": self.chunks_committed,
+                "failed": self.chunks_failed,
+            },
+            "chunk_errors": self.chunk_errors,
+        }
+
+
+class ImportAborted(Exception):
+    """The job was failed by someone else while the worker was running it."""
+
+
+def claim_next_import_job():
+    """
+    Atomically move the oldest pending ImportJob to running and return it.
+    SKIP LOCKED lets several workers poll the same table without ever
+    picking up the same job; returns None when the queue is empty.
+    """
+    with transaction.atomic():
+        job = (
+            ImportJob.objects.select_for_update(skip_locked=True)
+            .filter(status=ImportJob.STATUS_PENDING)
+            .order_by("created_at")
+            .first()
+        )
+        if job is None:
+            return None
+        job.status = ImportJob.STATUS_RUNNING
+        job.started_at = job.heartbeat_at = timezone.now()
+        job.save(update_fields=["status", "started_at", "heartbeat_at"])
+    return job
+
+
+def fail_import_job(job_id, detail):
+    """
+    Mark a running job failed and remove its upload; returns whether it
+    was still running.
+    """
+    with transaction.atomic():
+        job = (
+            ImportJob.objects.select_for_update()
+            .filter(pk=job_id, status=ImportJob.STATUS_RUNNING)
+            .first()
+        )
+        if job is None:
+            return False
+        _finish_failed([job], detail)
+    return True
+
+
+def fail_stale_import_jobs(timeout=IMPORT_JOB_TIMEOUT):
+    """
+    Mark running jobs that have not reported progress for `timeout` as
+    failed, so a job whose worker died does not stay "running" forever;
+    long imports keep their job alive by reporting after every chunk. Chunks it
+    committed stay imported; re-uploading the file skips them as
+    duplicates. Returns the number of jobs failed.
+    """
+    with transaction.atomic():
+        jobs = list(
+            ImportJob.objects.select_for_update(skip_locked=True).filter(
+                status=ImportJob.STATUS_RUNNING,
+                heartbeat_at__lt=timezone.now() - timeout,
+            )
+        )
+        _finish_failed(
+            jobs, "The import worker stopped before finishing; upload the file again."
+        )
+    return len(jobs)
+
+
+def _finish_failed(jobs, detail):
+    ImportJob.objects.filter(pk__in=[job.pk for job in jobs]).update(
+        status=ImportJob.STATUS_FAILED,
+        detail=detail,
+        finished_at=timezone.now(),
+        file="",
+    )
+    for job in jobs:
+        # the statement is not kept once its job is over, whatever the outcome
+        job.file.delete(save=False)
+
+
+def run_import_job(job):
+    """
+    Process a claimed ImportJob with the streaming importer, recording
+    progress on the job after every chunk. The stored upload is removed
+    once the job has finished, whether it succeeded or not.
+    """
+
+    def report_progress(importer):
+        running = ImportJob.objects.filter(
+            pk=job.pk, status=ImportJob.STATUS_RUNNING
+        ).update(
+            rows_processed=importer.rows_processed,
+            created=importer.created,
+            skipped=importer.skipped,
+            duplicates=importer.duplicates,
+            heartbeat_at=timezone.now(),
+        )
+        if not running:
+            # failed as stale in the meantime; stop posting rows for it
+            raise ImportAborted(f"Import job {job.pk} is no longer running")
+
+    importer = TransactionImporter(job.user, max_errors=STREAM_MAX_ERRORS)
+    try:
+        with job.file.open("rb") as upload:
+            importer.import_stream(iter_csv_rows(upload), on_chunk=report_progress)
+    except Exception as e:
+        logger.exception(f"Import job {job.pk} failed")
+        job.status = ImportJob.STATUS_FAILED
+        job.detail = str(e)
+    else:
+        job.status = ImportJob.STATUS_SUCCEEDED
+        failed = importer.chunks_failed
+        if failed:
+            job.detail = f"{failed} chunk(s) failed: " + "; ".join(
+                f"chunk {c['chunk']}: {c['error']}" for c in importer.chunk_errors
+            )
+    finally:
+        job.file.delete(save=False)
+
+    job.rows_processed = importer.rows_processed
+    job.created = importer.created
+    job.skipped = importer.skipped
+    job.duplicates = importer.duplicates
+    job.errors = importer.errors
+    job.finished_at = timezone.now()
+    # only a job that is still ours: one failed as stale stays failed
+    fields = (
+        "status",
+        "detail",
+        "rows_processed",
+        "created",
+        "skipped",
+        "duplicates",
+        "errors",
+        "finished_at",
+    )
+    finished = ImportJob.objects.filter(
+        pk=job.pk, status=ImportJob.STATUS_RUNNING
+    ).update(file="", **{field: getattr(job, field) for field in fields})
+    if not finished:
+        job.refresh_from_db()
+    return job
@@ -0,0 +1,67 @@
+# backend/finance/ledger.py
+from collections import defaultdict
+from decimal import Decimal
+from django.db.models import F
+from .models import Account, Transaction
+from .rollups import apply_rollup_deltas, collect_rollup_deltas
+from .signals import _transaction_effect
+from .snapshots import as_date, rebuild_snapshots
+from .versioning import bump_data_versions
+
+BULK_BATCH_SIZE = 1000
+
+
+def apply_balance_deltas(deltas, batch_size=BULK_BATCH_SIZE):
+    """
+    Apply a {account_id: Decimal} mapping of balance changes with
+    relative F-expression updates, one UPDATE per `batch_size` accounts.
+    """
+    accounts = [
+        Account(pk=account_id, balance=F("balance") + delta)
+        for account_id, delta in sorted(deltas.items())
+        if delta != Decimal("0.00")
+    ]
+    Account.objects.bulk_update(accounts, ["balance"], batch_size=batch_size)
+
+
+def bulk_post_transactions(transactions, batch_size=BULK_BATCH_SIZE):
+    """
+    Insert unsaved Transaction instances with bulk_create and apply their
+    combined effect to each account and to each monthly rollup row, in
+    batched updates. Balance snapshots of each account are rebuilt from
+    its earliest new date and the owners' data versions are bumped, which
+    retires their cached analytics.
+
+    bulk_create does not send post_save, so the per-row balance signal
+    never fires here; callers should wrap this in transaction.atomic()
+    so rows and balances commit together.
+    Each instance must have `account` and `category` set (not just ids),
+    since the category type decides the sign of the effect.
+    """
+    if not transactions:
+        return []
+
+    deltas = defaultdict(Decimal)
+    first_dates = {}
+    user_ids = set()
+    rollup_rows = []
+    for tx in transactions:
+        if not tx.fingerprint:
+            tx.fingerprint = tx.compute_fingerprint()
+        effect = _transaction_effect(tx)
+        deltas[tx.account_id] += effect
+        date = as_date(tx.date)
+        first_dates[tx.account_id] = min(date, first_dates.get(tx.account_id, date))
+        user_ids.add(tx.user_id)
+        rollup_rows.append((tx.user_id, date, tx.category_id, effect))
+
+    created = Transaction.objects.bulk_create(transactions, batch_size=batch_size)
+    apply_balance_deltas(deltas)
+    apply_rollup_deltas(collect_rollup_deltas(rollup_rows))
+    accounts_since = defaultdict(list)
+    for account_id, since in first_dates.items():
+        accounts_since[since].append(account_id)
+    for since, account_ids in accounts_since.items():
+        rebuild_snapshots(account_ids, since=since)
+    bump_data_versions(user_ids)
+    return created
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+from finance.models import Account
+from finance.snapshots import rebuild_snapshots
+from finance.versioning import bump_data_version
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuilds the daily balance snapshots of every account from its transactions."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=200,
+            help="Accounts rebuilt per aggregate query.",
+        )
+        parser.add_argument("--user", help="Only rebuild this username's accounts.")
+
+    def handle(self, *args, **options):
+        accounts = Account.objects.order_by("pk")
+        if options["user"]:
+            accounts = accounts.filter(user__username=options["user"])
+        account_ids = list(accounts.values_list("pk", flat=True))
+
+        size = options["chunk_size"]
+        written = 0
+        for i in range(0, len(account_ids), size):
+            written += rebuild_snapshots(account_ids[i : i + size])
+        if options["user"]:
+            for user_id in set(accounts.values_list("user_id", flat=True)):
+                bump_data_version(user_id)
+        else:
+            bump_data_version()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Wrote {written} snapshots for {len(account_ids)} accounts."
+            )
+        )
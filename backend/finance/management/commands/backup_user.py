@@ -0,0 +1,25 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from finance.backup import write_archive
+
+
+class Command(BaseCommand):
+    help = "Writes a compressed archive of all of a user's finance data."
+
+    def add_arguments(self, parser):
+        parser.add_argument("username")
+        parser.add_argument("path", help="Output file, e.g. alice.quanta.gz")
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        try:
+            user = User.objects.get_by_natural_key(options["username"])
+        except User.DoesNotExist:
+            raise CommandError(f"No user named {options['username']!r}.")
+
+        with open(options["path"], "wb") as fileobj:
+            write_archive(user, fileobj)
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Wrote backup of {user} to {options['path']}.")
+        )
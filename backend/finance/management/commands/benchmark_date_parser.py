@@ -0,0 +1,48 @@
+import datetime
+import random
+import timeit
+from django.core.management.base import BaseCommand
+from finance.dateparse import DateParser, parse_date
+
+
+class Command(BaseCommand):
+    help = (
+        "Micro-benchmark: per-value format retries (parse_date) versus a "
+        "sniffed, memoized DateParser on statement-like date columns."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=50000)
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=90,
+            help="Distinct dates in the generated column.",
+        )
+        parser.add_argument("--repeat", type=int, default=3)
+
+    def handle(self, *args, **options):
+        start = datetime.date(2024, 1, 1)
+        days = [start + datetime.timedelta(days=i) for i in range(options["days"])]
+
+        for fmt in ("%Y-%m-%d", "%m/%d/%Y"):
+            values = [random.choice(days).strftime(fmt) for _ in range(options["rows"])]
+
+            def legacy():
+                for value in values:
+                    parse_date(value)
+
+            def sniffed():
+                parser = DateParser.sniff(values[:100])
+                for value in values:
+                    parser.parse(value)
+
+            legacy_time = min(timeit.repeat(legacy, number=1, repeat=options["repeat"]))
+            sniffed_time = min(
+                timeit.repeat(sniffed, number=1, repeat=options["repeat"])
+            )
+            self.stdout.write(
+                f"{fmt:>10}  parse_date: {legacy_time * 1000:8.1f} ms   "
+                f"DateParser: {sniffed_time * 1000:8.1f} ms   "
+                f"speedup: {legacy_time / sniffed_time:5.1f}x"
+            )
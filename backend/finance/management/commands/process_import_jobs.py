@@ -0,0 +1,72 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, close_old_connections
+from finance.importers import (
+    claim_next_import_job,
+    fail_import_job,
+    fail_stale_import_jobs,
+    run_import_job,
+)
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Runs queued CSV import jobs. Polls the database; no broker required."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Process the jobs currently queued, then exit.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=5.0,
+            help="Seconds to wait between polls when the queue is empty.",
+        )
+
+    def handle(self, *args, **options):
+        processed = 0
+        while True:
+            try:
+                fail_stale_import_jobs()
+                job = claim_next_import_job()
+            except DatabaseError:
+                if options["once"]:
+                    raise
+                logger.exception("Could not poll the import queue")
+                self._sleep(options["interval"])
+                continue
+            if job is None:
+                if options["once"]:
+                    break
+                self._sleep(options["interval"])
+                continue
+
+            processed += 1
+            try:
+                job = run_import_job(job)
+            except Exception as e:
+                # one bad job must not stop the worker for everyone else
+                logger.exception(f"Import job {job.pk} crashed")
+                self._fail(job, e)
+                continue
+            logger.info(f"Import job {job.pk} finished with status {job.status}.")
+
+        self.stdout.write(self.style.SUCCESS(f"Processed {processed} import jobs."))
+
+    def _sleep(self, seconds):
+        time.sleep(seconds)
+        # drop connections the database closed (or broke) in the meantime
+        close_old_connections()
+
+    def _fail(self, job, error):
+        try:
+            fail_import_job(job.pk, f"Import failed: {error}")
+        except DatabaseError:
+            # fail_stale_import_jobs picks the job up later
+            logger.exception(f"Could not mark import job {job.pk} as failed")
+            close_old_connections()
@@ -1,41 +1,55 @@
-from django.core.management.base import BaseCommand
-from django.utils import timezone
-from finance.models import RecurringTransaction, Transaction
+from django.core.management.base import BaseCommand, CommandError
+from finance.recurring import RECURRING_BATCH_SIZE, process_recurring_parallel
 import logging
 
 logger = logging.getLogger(__name__)
 
 
 class Command(BaseCommand):
-    help = "Processes all due recurring transactions and creates standard Transaction objects."
+    help = (
+        "Posts every due occurrence of the recurring transactions, catching "
+        "up rules that are behind, in batches. Safe to run concurrently: "
+        "rules are claimed with SELECT ... FOR UPDATE SKIP LOCKED."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=RECURRING_BATCH_SIZE,
+            help="Rules claimed per database transaction.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Processes working through the due rules in parallel.",
+        )
+        parser.add_argument(
+            "--shards",
+            type=int,
+            default=1,
+            help="Split the rules by user into this many shards.",
+        )
+        parser.add_argument(
+            "--shard",
+            type=int,
+            default=0,
+            help="The shard (0 to --shards - 1) this run processes.",
+        )
 
     def handle(self, *args, **options):
-        today = timezone.localdate()
-        # Get all recurring items that are due to be processed
-        due_items = RecurringTransaction.objects.filter(next_date__lte=today)
-
-        created_count = 0
-        for item in due_items:
-            # Check if the recurring transaction has expired
-            if item.next_date and item.next_date > item.next_date:
-                continue
-
-            # Create a new standard transaction
-            Transaction.objects.create(
-                user=item.user,
-                account=item.account,
-                category=item.category,
-                amount=item.amount,
-                date=item.next_date,
-                notes=f"Recurring: {item.notes or 'Monthly'}",
-            )
-            created_count += 1
-
-            # Advance the 'next_date' for the next cycle
-            item.advance_next_date()
-
+        if options["shards"] < 1 or not 0 <= options["shard"] < options["shards"]:
+            raise CommandError("--shard must be between 0 and --shards - 1.")
+        rules, created_count = process_recurring_parallel(
+            options["workers"],
+            batch_size=options["batch_size"],
+            shard=options["shard"],
+            shards=options["shards"],
+        )
         self.stdout.write(
             self.style.SUCCESS(
-                f"Successfully created {created_count} recurring transactions."
+                f"Successfully created {created_count} recurring transactions "
+                f"for {rules} rules."
             )
         )
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from django.contrib.auth import get_user_model
+from finance.rollups import rebuild_monthly_totals
+from finance.versioning import bump_data_version
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the monthly per-category rollup from transactions."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", help="Only rebuild this username's totals.")
+
+    def handle(self, *args, **options):
+        user_ids = None
+        if options["user"]:
+            user_ids = list(
+                get_user_model()
+                .objects.filter(username=options["user"])
+                .values_list("pk", flat=True)
+            )
+        written = rebuild_monthly_totals(user_ids=user_ids)
+        if user_ids is None:
+            bump_data_version()
+        for user_id in user_ids or []:
+            bump_data_version(user_id)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} monthly totals."))
@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+from finance.balances import RECONCILE_CHUNK_SIZE, reconcile_balances
+from finance.models import Account
+
+
+class Command(BaseCommand):
+    help = (
+        "Recomputes account balances from opening balances and transactions, "
+        "reports drift and optionally fixes it."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--fix", action="store_true", help="Correct drifted balances."
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Threads reconciling chunks in parallel.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=RECONCILE_CHUNK_SIZE,
+            help="Accounts per aggregate query.",
+        )
+        parser.add_argument("--user", help="Only reconcile this username.")
+
+    def handle(self, *args, **options):
+        accounts = Account.objects.all()
+        if options["user"]:
+            accounts = accounts.filter(user__username=options["user"])
+
+        drifted = 0
+        for drift in reconcile_balances(
+            accounts,
+            fix=options["fix"],
+            workers=options["workers"],
+            chunk_size=options["chunk_size"],
+        ):
+            drifted += 1
+            self.stdout.write(
+                f"account {drift.account_id} ({drift.name}, user {drift.user_id}): "
+                f"stored {drift.stored}, expected {drift.expected}, "
+                f"drift {drift.amount}"
+            )
+
+        verb = "Fixed" if options["fix"] else "Found"
+        self.stdout.write(
+            self.style.SUCCESS(f"{verb} {drifted} accounts with balance drift.")
+        )
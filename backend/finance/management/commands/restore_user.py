@@ -0,0 +1,32 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from finance.backup import RestoreError, read_archive
+
+
+class Command(BaseCommand):
+    help = "Restores a user's finance data from an archive written by backup_user."
+
+    def add_arguments(self, parser):
+        parser.add_argument("username")
+        parser.add_argument("path")
+        parser.add_argument(
+            "--replace",
+            action="store_true",
+            help="Delete the user's existing finance data before restoring.",
+        )
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        try:
+            user = User.objects.get_by_natural_key(options["username"])
+        except User.DoesNotExist:
+            raise CommandError(f"No user named {options['username']!r}.")
+
+        try:
+            with open(options["path"], "rb") as fileobj:
+                counts = read_archive(user, fileobj, replace=options["replace"])
+        except RestoreError as e:
+            raise CommandError(str(e))
+
+        summary = ", ".join(f"{count} {name}" for name, count in counts.items())
+        self.stdout.write(self.style.SUCCESS(f"Restored {summary} for {user}."))
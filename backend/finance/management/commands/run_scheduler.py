@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from finance.recurring import RECURRING_BATCH_SIZE
+from finance.scheduler import DEFAULT_POLL_INTERVAL, RecurringScheduler
+
+
+class Command(BaseCommand):
+    help = (
+        "Long-running recurring transaction scheduler: sleeps until the next "
+        "rule falls due and polls for rule changes in between."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=DEFAULT_POLL_INTERVAL,
+            help="Seconds between checks for new or edited rules.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Processes posting due rules in parallel.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=RECURRING_BATCH_SIZE,
+            help="Rules claimed per database transaction.",
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write("Starting recurring transaction scheduler...")
+        RecurringScheduler(
+            poll_interval=options["poll_interval"],
+            workers=options["workers"],
+            batch_size=options["batch_size"],
+        ).run_forever()
@@ -0,0 +1,71 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:42
+
+import datetime
+import hashlib
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+
+
+def transaction_fingerprint(user_id, account_id, date, amount, notes):
+    """
+    Frozen copy of finance.models.transaction_fingerprint as of this
+    migration, so the backfill does not change if the model's hash does.
+    """
+    if isinstance(date, datetime.datetime):
+        date = date.date()
+    elif isinstance(date, str):
+        date = datetime.date.fromisoformat(date)
+    amount = Decimal(str(amount or 0)).quantize(Decimal("0.01"))
+    notes = " ".join((notes or "").split()).casefold()
+    payload = f"{user_id}|{account_id}|{date.isoformat()}|{amount}|{notes}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def backfill_fingerprints(apps, schema_editor):
+    """
+    Fingerprint existing transactions in batches, so later imports can
+    recognise rows that are already in the database.
+    """
+    Transaction = apps.get_model("finance", "Transaction")
+    batch = []
+    for tx in Transaction.objects.only(
+        "user_id", "account_id", "date", "amount", "notes"
+    ).iterator(chunk_size=2000):
+        tx.fingerprint = transaction_fingerprint(
+            tx.user_id, tx.account_id, tx.date, tx.amount, tx.notes
+        )
+        batch.append(tx)
+        if len(batch) >= 2000:
+            Transaction.objects.bulk_update(batch, ["fingerprint"])
+            batch = []
+    if batch:
+        Transaction.objects.bulk_update(batch, ["fingerprint"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("finance", "0007_importjob"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="importjob",
+            name="duplicates",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="transaction",
+            name="fingerprint",
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+        migrations.AddIndex(
+            model_name="transaction",
+            index=models.Index(
+                fields=["user", "fingerprint"], name="transaction_fingerprint_idx"
+            ),
+        ),
+        migrations.RunPython(backfill_fingerprints, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:47
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Case, F, OuterRef, Subquery, Sum, When
+from django.db.models.functions import Coalesce
+
+
+def backfill_opening_balances(apps, schema_editor):
+    """
+    Assume current balances are right and work back to the opening balance:
+    opening = balance - net effect of the account's transactions.
+    """
+    Account = apps.get_model("finance", "Account")
+    Transaction = apps.get_model("finance", "Transaction")
+    totals = (
+        Transaction.objects.filter(account=OuterRef("pk"))
+        .order_by()
+        .values("account")
+        .annotate(
+            total=Sum(
+                Case(
+                    When(category__type="expense", then=-F("amount")),
+                    default=F("amount"),
+                )
+            )
+        )
+        .values("total")
+    )
+    Account.objects.update(
+        opening_balance=F("balance")
+        - Coalesce(
+            Subquery(totals, output_field=models.DecimalField()), Decimal("0.00")
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("finance", "0009_transaction_updated_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="account",
+            name="opening_balance",
+            field=models.DecimalField(
+                blank=True, decimal_places=2, editable=False, max_digits=12, null=True
+            ),
+        ),
+        migrations.RunPython(backfill_opening_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,90 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:54
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Case, Count, F, Sum, When
+from django.db.models.functions import TruncMonth
+
+
+def backfill_monthly_totals(apps, schema_editor):
+    Transaction = apps.get_model("finance", "Transaction")
+    MonthlyCategoryTotal = apps.get_model("finance", "MonthlyCategoryTotal")
+    grouped = (
+        Transaction.objects.order_by()
+        .annotate(month=TruncMonth("date"))
+        .values("user_id", "month", "category_id")
+        .annotate(
+            total=Sum(
+                Case(
+                    When(category__type="expense", then=-F("amount")),
+                    default=F("amount"),
+                )
+            ),
+            count=Count("id"),
+        )
+    )
+    MonthlyCategoryTotal.objects.bulk_create(
+        (MonthlyCategoryTotal(**row) for row in grouped.iterator()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("finance", "0011_accountbalancesnapshot"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MonthlyCategoryTotal",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("month", models.DateField(help_text="First day of the month.")),
+                (
+                    "total",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                ("count", models.IntegerField(default=0)),
+                (
+                    "category",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="monthly_totals",
+                        to="finance.category",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="monthly_totals",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["month"],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("user", "month", "category"),
+                        name="unique_monthly_category_total",
+                        nulls_distinct=False,
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(backfill_monthly_totals, migrations.RunPython.noop),
+    ]
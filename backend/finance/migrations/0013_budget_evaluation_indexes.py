@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:58
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("finance", "0012_monthlycategorytotal"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="budget",
+            index=models.Index(
+                fields=["user", "end_date", "start_date"], name="budget_period_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="transaction",
+            index=models.Index(
+                fields=["category", "user", "date"], name="transaction_category_idx"
+            ),
+        ),
+    ]
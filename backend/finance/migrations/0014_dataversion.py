@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:02
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def create_data_versions(apps, schema_editor):
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    DataVersion = apps.get_model("finance", "DataVersion")
+    DataVersion.objects.bulk_create(
+        (DataVersion(user_id=pk) for pk in User.objects.values_list("pk", flat=True)),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("auth", "0012_alter_user_first_name_max_length"),
+        ("finance", "0013_budget_evaluation_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DataVersion",
+            fields=[
+                (
+                    "user",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="finance_data_version",
+                        serialize=False,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                ("version", models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(create_data_versions, migrations.RunPython.noop),
+    ]
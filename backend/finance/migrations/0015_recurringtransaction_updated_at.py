@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:12
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("finance", "0014_dataversion"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="recurringtransaction",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name="recurringtransaction",
+            index=models.Index(fields=["updated_at"], name="recurring_updated_idx"),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:15
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("finance", "0015_recurringtransaction_updated_at"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="transaction",
+            index=models.Index(
+                fields=["user", "-date", "-created_at", "-id"],
+                name="transaction_keyset_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:49
+
+import finance.storage
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.db import migrations, models
+
+
+def move_uploads(apps, schema_editor):
+    """
+    Move the uploads of jobs still waiting to run out of MEDIA_ROOT into
+    the private storage, and delete those of jobs that already finished.
+    """
+    ImportJob = apps.get_model("finance", "ImportJob")
+    media = FileSystemStorage(location=settings.MEDIA_ROOT)
+    private = FileSystemStorage(location=settings.IMPORT_UPLOAD_ROOT)
+    for job in ImportJob.objects.exclude(file=""):
+        name = job.file.name
+        if not media.exists(name):
+            continue
+        if job.status in ("pending", "running"):
+            with media.open(name) as upload:
+                job.file.name = private.save(name, upload)
+        else:
+            job.file.name = ""
+        job.save(update_fields=["file"])
+        media.delete(name)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("finance", "0016_transaction_keyset_index"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="importjob",
+            name="file",
+            field=models.FileField(
+                storage=finance.storage.PrivateUploadStorage(), upload_to="%Y/%m/%d/"
+            ),
+        ),
+        migrations.RunPython(move_uploads, migrations.RunPython.noop),
+    ]
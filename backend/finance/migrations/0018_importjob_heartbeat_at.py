@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:50
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_heartbeats(apps, schema_editor):
+    # jobs already running count from their start, as they used to
+    ImportJob = apps.get_model("finance", "ImportJob")
+    ImportJob.objects.filter(started_at__isnull=False).update(
+        heartbeat_at=F("started_at")
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("finance", "0017_importjob_private_storage"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="importjob",
+            name="heartbeat_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_heartbeats, migrations.RunPython.noop),
+    ]
@@ -2,7 +2,10 @@ from decimal import Decimal
 from django.conf import settings
 from django.db import models
 from django.utils import timezone
+from .storage import PrivateUploadStorage
 import calendar
+import datetime
+import hashlib
 
 # --- Core Models ---
 
@@ -22,6 +25,10 @@ class Account(models.Model):
     balance = models.DecimalField(
         max_digits=12, decimal_places=2, default=Decimal("0.00")
     )
+    # balance before any transaction; balance = opening_balance + effects
+    opening_balance = models.DecimalField(
+        max_digits=12, decimal_places=2, null=True, blank=True, editable=False
+    )
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -32,6 +39,11 @@ class Account(models.Model):
     def __str__(self):
         return f"{self.name} ({self.currency})"
 
+    def save(self, *args, **kwargs):
+        if self.opening_balance is None:
+            self.opening_balance = self.balance
+        super().save(*args, **kwargs)
+
 
 class Category(models.Model):
     TYPE_EXPENSE = "expense"
@@ -55,6 +67,46 @@ class Category(models.Model):
     def __str__(self):
         return f"{self.name} ({self.type})"
 
+    # Type as last read from / written to the database, so the rollup signal
+    # only rebuilds when a save actually flips it.
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._original_type = instance.__dict__.get("type")
+        return instance
+
+    def type_changed(self):
+        """Whether the type differs from the stored one (True if unknown)."""
+        original = getattr(self, "_original_type", None)
+        return original is None or original != self.type
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        if fields is None or "type" in fields:
+            self._original_type = self.type
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or "type" in update_fields:
+            self._original_type = self.type
+
+
+def transaction_fingerprint(user_id, account_id, date, amount, notes):
+    """
+    Content hash identifying "the same" transaction across imports:
+    user, account, day, amount to the cent and notes with case and
+    whitespace normalized.
+    """
+    if isinstance(date, datetime.datetime):
+        date = date.date()
+    elif isinstance(date, str):
+        date = datetime.date.fromisoformat(date)
+    amount = Decimal(str(amount or 0)).quantize(Decimal("0.01"))
+    notes = " ".join((notes or "").split()).casefold()
+    payload = f"{user_id}|{account_id}|{date.isoformat()}|{amount}|{notes}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
 
 class Transaction(models.Model):
     user = models.ForeignKey(
@@ -74,13 +126,158 @@ class Transaction(models.Model):
     date = models.DateField(default=timezone.now)
     notes = models.TextField(blank=True)
     created_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True)
+    # see transaction_fingerprint(); kept current by save() and bulk posting
+    fingerprint = models.CharField(max_length=64, blank=True, editable=False)
 
     class Meta:
         ordering = ["-date", "-created_at"]
+        indexes = [
+            models.Index(
+                fields=["user", "fingerprint"], name="transaction_fingerprint_idx"
+            ),
+            models.Index(fields=["user", "updated_at"], name="transaction_updated_idx"),
+            # budget evaluation joins on category and a date range
+            models.Index(
+                fields=["category", "user", "date"], name="transaction_category_idx"
+            ),
+            # keyset pagination of the transaction list
+            models.Index(
+                fields=["user", "-date", "-created_at", "-id"],
+                name="transaction_keyset_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.amount} on {self.date} — {self.account.name}"
 
+    def compute_fingerprint(self):
+        return transaction_fingerprint(
+            self.user_id, self.account_id, self.date, self.amount, self.notes
+        )
+
+    # Values as last read from / written to the database, so the balance
+    # signals can diff an edit without re-reading the row.
+    TRACKED_FIELDS = ("account_id", "category_id", "amount", "date")
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._snapshot_tracked()
+        return instance
+
+    def _snapshot_tracked(self):
+        if all(f in self.__dict__ for f in self.TRACKED_FIELDS):
+            self._original = {f: self.__dict__[f] for f in self.TRACKED_FIELDS}
+        else:
+            # some tracked field is deferred; the signals re-read the row
+            self._original = None
+
+    def tracked_original(self):
+        """Tracked values as stored in the database, or None if unknown."""
+        return getattr(self, "_original", None)
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        if fields is None:
+            self._snapshot_tracked()
+        else:
+            # other fields may hold unsaved edits, so the snapshot is unknown
+            self._original = None
+
+    def save(self, *args, **kwargs):
+        self.fingerprint = self.compute_fingerprint()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            kwargs["update_fields"] = {*update_fields, "fingerprint", "updated_at"}
+        super().save(*args, **kwargs)
+        if update_fields is None:
+            self._snapshot_tracked()
+        elif self.tracked_original() is not None:
+            saved = {self._meta.get_field(f).attname for f in kwargs["update_fields"]}
+            self._original.update(
+                {f: self.__dict__[f] for f in self.TRACKED_FIELDS if f in saved}
+            )
+
+
+class AccountBalanceSnapshot(models.Model):
+    """
+    End-of-day balance of an account, stored only for days with activity;
+    the balance on any other day is that of the closest earlier snapshot.
+    """
+
+    account = models.ForeignKey(
+        Account, on_delete=models.CASCADE, related_name="balance_snapshots"
+    )
+    date = models.DateField()
+    balance = models.DecimalField(max_digits=12, decimal_places=2)
+
+    class Meta:
+        ordering = ["date"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["account", "date"], name="unique_account_snapshot_date"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.account_id} on {self.date}: {self.balance}"
+
+
+class MonthlyCategoryTotal(models.Model):
+    """
+    Signed total (income positive, expenses negative, as applied to
+    balances) and row count of a user's transactions per month and
+    category; category is null for uncategorized transactions.
+    """
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="monthly_totals",
+    )
+    month = models.DateField(help_text="First day of the month.")
+    category = models.ForeignKey(
+        Category,
+        on_delete=models.CASCADE,
+        related_name="monthly_totals",
+        null=True,
+        blank=True,
+    )
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ["month"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "month", "category"],
+                name="unique_monthly_category_total",
+                nulls_distinct=False,
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} {self.month:%Y-%m} {self.category_id}: {self.total}"
+
+
+class DataVersion(models.Model):
+    """
+    Counter bumped on every write to a user's finance data; the API
+    derives its ETags from it.
+    """
+
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="finance_data_version",
+    )
+    version = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.user_id} v{self.version}"
+
 
 class Budget(models.Model):
     user = models.ForeignKey(
@@ -96,6 +293,11 @@ class Budget(models.Model):
 
     class Meta:
         ordering = ["-start_date"]
+        indexes = [
+            models.Index(
+                fields=["user", "end_date", "start_date"], name="budget_period_idx"
+            )
+        ]
 
     def __str__(self):
         return f"Budget {self.category.name} {self.amount}"
@@ -133,6 +335,13 @@ class RecurringTransaction(models.Model):
         max_length=10, choices=FREQ_CHOICES, default=FREQ_MONTHLY
     )
     created_at = models.DateTimeField(auto_now_add=True)
+    # also set by the recurring engine; the scheduler polls its maximum
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["updated_at"], name="recurring_updated_idx"),
+        ]
 
     def __str__(self):
         return f"Recurring {self.amount} {self.frequency} for {self.user}"
@@ -152,5 +361,47 @@ class RecurringTransaction(models.Model):
             self.next_date = self.next_date.replace(
                 year=new_year, month=new_month, day=day
             )
-        self.save(update_fields=["next_date"])
+        self.save(update_fields=["next_date", "updated_at"])
         return self.next_date
+
+
+# --- Import Jobs ---
+
+
+class ImportJob(models.Model):
+    STATUS_PENDING = "pending"
+    STATUS_RUNNING = "running"
+    STATUS_SUCCEEDED = "succeeded"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = (
+        (STATUS_PENDING, "Pending"),
+        (STATUS_RUNNING, "Running"),
+        (STATUS_SUCCEEDED, "Succeeded"),
+        (STATUS_FAILED, "Failed"),
+    )
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="import_jobs"
+    )
+    file = models.FileField(upload_to="%Y/%m/%d/", storage=PrivateUploadStorage())
+    status = models.CharField(
+        max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING
+    )
+    rows_processed = models.PositiveIntegerField(default=0)
+    created = models.PositiveIntegerField(default=0)
+    skipped = models.PositiveIntegerField(default=0)
+    duplicates = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True)
+    detail = models.TextField(blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    # last sign of life from the worker, refreshed after every chunk
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [models.Index(fields=["status", "created_at"])]
+
+    def __str__(self):
+        return f"Import {self.pk} ({self.status}) for {self.user}"
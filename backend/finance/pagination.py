@@ -0,0 +1,128 @@
+# backend/finance/pagination.py
+import base64
+import binascii
+import json
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Opt-in keyset pagination. Lists are returned whole unless the request
+    has a `limit` or `cursor` param (or `paginate_by_default` is set);
+    then rows are ordered by the view's `keyset_ordering` and a page holds
+    the `limit` rows after the cursor, found with a range condition on
+    those fields rather than an OFFSET, so deep pages cost the same as the
+    first. No COUNT(*) is run.
+
+    The cursor is an opaque, URL-safe encoding of the last row's ordering
+    values; the ordering must end with a unique field such as id, and
+    should use fields that edits do not change, or an edited row can move
+    past the cursor and be skipped or repeated.
+    """
+
+    limit_query_param = "limit"
+    cursor_query_param = "cursor"
+    default_limit = 50
+    max_limit = 500
+    invalid_cursor_message = "Invalid cursor"
+    paginate_by_default = False
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if (
+            not self.paginate_by_default
+            and self.limit_query_param not in params
+            and self.cursor_query_param not in params
+        ):
+            return None
+        self.request = request
+        self.ordering = getattr(view, "keyset_ordering", ("-id",))
+        self.limit = self.get_limit(params)
+
+        self.fields = [
+            (queryset.model._meta.get_field(name.lstrip("-")), name.startswith("-"))
+            for name in self.ordering
+        ]
+        queryset = queryset.order_by(*self.ordering)
+        cursor = params.get(self.cursor_query_param)
+        if cursor:
+            queryset = queryset.filter(self.after(self.decode_cursor(cursor)))
+        rows = list(queryset[: self.limit + 1])
+        self.next_cursor = None
+        if len(rows) > self.limit:
+            rows = rows[: self.limit]
+            self.next_cursor = self.encode_cursor(rows[-1])
+        return rows
+
+    def get_limit(self, params):
+        """The requested page size, capped at max_limit; default if invalid."""
+        try:
+            limit = int(params[self.limit_query_param])
+        except (KeyError, ValueError):
+            return self.default_limit
+        if limit <= 0:
+            return self.default_limit
+        return min(limit, self.max_limit)
+
+    def encode_cursor(self, instance):
+        values = [field.value_to_string(instance) for field, _ in self.fields]
+        return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+    def decode_cursor(self, cursor):
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            if not isinstance(values, list) or len(values) != len(self.fields):
+                raise ValueError
+            return [
+                field.to_python(value) for (field, _), value in zip(self.fields, values)
+            ]
+        except (binascii.Error, TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def after(self, values):
+        """
+        Rows strictly after `values` in the keyset ordering: a tie on the
+        leading fields is broken by the next one. The bound on the first
+        field alone lets the database range-scan an index on the ordering.
+        """
+        fields = [(field.name, desc) for field, desc in self.fields]
+        condition = Q()
+        for i, (name, desc) in enumerate(fields):
+            ties = {prev: values[j] for j, (prev, _) in enumerate(fields[:i])}
+            condition |= Q(**ties, **{f"{name}__{'lt' if desc else 'gt'}": values[i]})
+        first, desc = fields[0]
+        return Q(**{f"{first}__{'lte' if desc else 'gte'}": values[0]}) & condition
+
+    def get_paginated_response(self, data):
+        next_link = None
+        if self.next_cursor is not None:
+            next_link = replace_query_param(
+                self.request.build_absolute_uri(),
+                self.cursor_query_param,
+                self.next_cursor,
+            )
+        return Response({"next": next_link, "results": data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+
+class TransactionPagination(KeysetPagination):
+    """
+    Transactions are the one list that grows without bound, so it is always
+    paged; the app follows `next` as the user scrolls.
+    """
+
+    paginate_by_default = True
@@ -0,0 +1,154 @@
+# backend/finance/recurring.py
+import datetime
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import django
+import numpy as np
+from django.db import connections, transaction
+from django.db.models.functions import Mod
+from django.utils import timezone
+from .forecast import expand_rules
+from .ledger import BULK_BATCH_SIZE, bulk_post_transactions
+from .models import RecurringTransaction, Transaction
+
+RECURRING_BATCH_SIZE = 1000
+
+# most occurrences a new rule posts within the API request that creates it
+RECURRING_INLINE_LIMIT = 100
+
+# a monthly step is at most 31 days, so expanding this far past the
+# cutoff always reaches each rule's next occurrence after it
+_LOOKAHEAD = datetime.timedelta(days=31)
+
+
+def due_occurrences(rules, until):
+    """
+    Every occurrence of `rules` from their next_date up to `until`, and
+    each rule's first occurrence after it, stepping like advance_next_date.
+    Returns ([(rule, date), ...], [next date per rule]).
+    """
+    if not rules:
+        return [], []
+    rule_idx, dates = expand_rules(
+        np.array([rule.next_date for rule in rules], dtype="datetime64[D]"),
+        np.array([rule.frequency for rule in rules]),
+        np.datetime64(until + _LOOKAHEAD),
+    )
+    cutoff = np.datetime64(until)
+    due = dates <= cutoff
+    next_dates = np.full(len(rules), np.datetime64("9999-12-31"))
+    np.minimum.at(next_dates, rule_idx[~due], dates[~due])
+
+    order = np.lexsort((dates[due], rule_idx[due]))
+    occurrences = [
+        (rules[i], date.item())
+        for i, date in zip(rule_idx[due][order].tolist(), dates[due][order])
+    ]
+    return occurrences, [date.item() for date in next_dates]
+
+
+def occurrence_transaction(rule, date):
+    label = rule.notes or rule.category or rule.get_frequency_display()
+    return Transaction(
+        user_id=rule.user_id,
+        account=rule.account,
+        category=rule.category,
+        amount=rule.amount,
+        date=date,
+        notes=f"Recurring: {label}",
+    )
+
+
+def post_due_occurrences(rules, today, batch_size=BULK_BATCH_SIZE):
+    """
+    Post every occurrence of `rules` due up to `today` through
+    bulk_post_transactions and move each rule's next_date past today,
+    in one database transaction. Returns the number of rows posted.
+    Rules need `account` and `category` loaded.
+    """
+    occurrences, next_dates = due_occurrences(rules, today)
+    with transaction.atomic():
+        bulk_post_transactions(
+            [occurrence_transaction(rule, date) for rule, date in occurrences],
+            batch_size=batch_size,
+        )
+        now = timezone.now()
+        for rule, next_date in zip(rules, next_dates):
+            rule.next_date = next_date
+            rule.updated_at = now
+        RecurringTransaction.objects.bulk_update(
+            rules, ["next_date", "updated_at"], batch_size=batch_size
+        )
+    return len(occurrences)
+
+
+def claim_due_rules(today, batch_size, shard=0, shards=1):
+    """
+    Lock up to `batch_size` rules due by `today` with SELECT ... FOR UPDATE
+    SKIP LOCKED, so overlapping runs never post the same occurrence: rules
+    claimed by another run are skipped, and once that run commits they are
+    no longer due. Must be called inside transaction.atomic().
+
+    With `shards` > 1 only users with user_id % shards == shard are
+    claimed; sharding by user keeps the accounts, rollups and data versions
+    that concurrent workers update disjoint.
+    """
+    rules = (
+        RecurringTransaction.objects.select_for_update(skip_locked=True, of=("self",))
+        .filter(next_date__lte=today)
+        .select_related("account", "category")
+        .order_by("pk")
+    )
+    if shards > 1:
+        rules = rules.alias(shard_key=Mod("user_id", shards)).filter(shard_key=shard)
+    return list(rules[:batch_size])
+
+
+def process_recurring(today=None, batch_size=RECURRING_BATCH_SIZE, shard=0, shards=1):
+    """
+    Catch every due recurring rule (of one shard) up to `today` (default:
+    the local date), claiming `batch_size` rules per database transaction.
+    Returns (rules processed, transactions posted).
+    """
+    today = today or timezone.localdate()
+    processed = posted = 0
+    while True:
+        with transaction.atomic():
+            rules = claim_due_rules(today, batch_size, shard, shards)
+            if not rules:
+                break
+            posted += post_due_occurrences(rules, today)
+        processed += len(rules)
+    return processed, posted
+
+
+def _process_in_worker(args):
+    try:
+        return process_recurring(*args)
+    finally:
+        connections.close_all()
+
+
+def process_recurring_parallel(
+    workers, today=None, batch_size=RECURRING_BATCH_SIZE, shard=0, shards=1
+):
+    """
+    process_recurring over a pool of `workers` processes, each taking its
+    own sub-shard of `shard` (of `shards`). Returns the summed counts.
+    """
+    if workers <= 1:
+        return process_recurring(today, batch_size, shard, shards)
+    today = today or timezone.localdate()
+    jobs = [
+        (today, batch_size, shard + shards * worker, shards * workers)
+        for worker in range(workers)
+    ]
+    # forked children must not share the parent's database connections
+    connections.close_all()
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("fork"),
+        initializer=django.setup,
+    ) as pool:
+        results = list(pool.map(_process_in_worker, jobs))
+    return tuple(sum(counts) for counts in zip(*results))
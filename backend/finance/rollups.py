@@ -0,0 +1,233 @@
+# backend/finance/rollups.py
+import calendar
+import datetime
+from collections import defaultdict
+from decimal import Decimal
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncMonth
+from .balances import effect_expression
+from .models import Category, MonthlyCategoryTotal, Transaction
+
+ZERO = Decimal("0.00")
+
+
+def month_start(date):
+    return date.replace(day=1)
+
+
+def next_month(date):
+    return (date.replace(day=1) + datetime.timedelta(days=32)).replace(day=1)
+
+
+def month_end(date):
+    """Last day of date's month; unlike next_month, fine for December 9999."""
+    return date.replace(day=calendar.monthrange(date.year, date.month)[1])
+
+
+def apply_rollup_delta(user_id, date, category_id, total, count):
+    """Add `total` and `count` to the user's row for date's month and category."""
+    if not total and not count:
+        return
+    rows = MonthlyCategoryTotal.objects.filter(
+        user_id=user_id, month=month_start(date), category_id=category_id
+    )
+    changes = {"total": F("total") + total, "count": F("count") + count}
+    if rows.update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            MonthlyCategoryTotal.objects.create(
+                user_id=user_id,
+                month=month_start(date),
+                category_id=category_id,
+                total=total,
+                count=count,
+            )
+    except IntegrityError:
+        rows.update(**changes)  # created concurrently
+
+
+def apply_rollup_deltas(deltas, batch_size=1000):
+    """
+    Apply a {(user_id, month, category_id): [total, count]} mapping:
+    existing rows get relative updates in batches, missing ones are
+    bulk-created (falling back to apply_rollup_delta if a row was created
+    concurrently).
+    """
+    deltas = {key: delta for key, delta in deltas.items() if delta[0] or delta[1]}
+    if not deltas:
+        return
+    existing = MonthlyCategoryTotal.objects.filter(
+        user_id__in={user_id for user_id, _, _ in deltas},
+        month__in={month for _, month, _ in deltas},
+    ).values_list("pk", "user_id", "month", "category_id")
+    pks = {
+        (user_id, month, category_id): pk
+        for pk, user_id, month, category_id in existing
+    }
+
+    # in primary key order, like concurrent batches, to avoid deadlocks
+    updated = [
+        MonthlyCategoryTotal(pk=pk, total=F("total") + total, count=F("count") + count)
+        for pk, total, count in sorted(
+            (pks[key], total, count)
+            for key, (total, count) in deltas.items()
+            if key in pks
+        )
+    ]
+    MonthlyCategoryTotal.objects.bulk_update(
+        updated, ["total", "count"], batch_size=batch_size
+    )
+    missing = {key: delta for key, delta in deltas.items() if key not in pks}
+    try:
+        with transaction.atomic():
+            MonthlyCategoryTotal.objects.bulk_create(
+                [
+                    MonthlyCategoryTotal(
+                        user_id=user_id,
+                        month=month,
+                        category_id=category_id,
+                        total=total,
+                        count=count,
+                    )
+                    for (user_id, month, category_id), (total, count) in missing.items()
+                ],
+                batch_size=batch_size,
+            )
+    except IntegrityError:
+        for (user_id, month, category_id), (total, count) in missing.items():
+            apply_rollup_delta(user_id, month, category_id, total, count)
+
+
+def collect_rollup_deltas(rows, deltas=None):
+    """Sum (user_id, date, category_id, effect) tuples into rollup deltas."""
+    deltas = defaultdict(lambda: [ZERO, 0]) if deltas is None else deltas
+    for user_id, date, category_id, effect in rows:
+        delta = deltas[(user_id, month_start(date), category_id)]
+        delta[0] += effect
+        delta[1] += 1
+    return deltas
+
+
+def rebuild_monthly_totals(user_ids=None, category_ids=None):
+    """
+    Recompute the rollup rows of the given users and/or categories (all
+    of them when both are None) with one grouped aggregate.
+    """
+    transactions = Transaction.objects.all()
+    rollups = MonthlyCategoryTotal.objects.all()
+    if user_ids is not None:
+        transactions = transactions.filter(user_id__in=user_ids)
+        rollups = rollups.filter(user_id__in=user_ids)
+    if category_ids is not None:
+        transactions = transactions.filter(category_id__in=category_ids)
+        rollups = rollups.filter(category_id__in=category_ids)
+
+    grouped = (
+        transactions.order_by()
+        .annotate(month=TruncMonth("date"))
+        .values("user_id", "month", "category_id")
+        .annotate(total=Sum(effect_expression()), count=Count("id"))
+        .values_list("user_id", "month", "category_id", "total", "count")
+    )
+    with transaction.atomic():
+        rollups.delete()
+        rows = [
+            MonthlyCategoryTotal(
+                user_id=user_id,
+                month=month,
+                category_id=category_id,
+                total=total,
+                count=count,
+            )
+            for user_id, month, category_id, total, count in grouped.iterator()
+        ]
+        MonthlyCategoryTotal.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def month_totals(user, month):
+    """
+    Income and expenses (both positive) of `user` in the month starting on
+    `month`, from the rollup.
+    """
+    return MonthlyCategoryTotal.objects.filter(user=user, month=month).aggregate(
+        income=Sum(
+            "total", filter=Q(category__type=Category.TYPE_INCOME), default=ZERO
+        ),
+        expenses=-Sum(
+            "total", filter=Q(category__type=Category.TYPE_EXPENSE), default=ZERO
+        ),
+    )
+
+
+OTHER_COLOR = "#cccccc"
+
+
+def _spending_item(category_id, name, amount, color):
+    return {
+        "category": category_id,
+        "fullName": name,
+        "name": name if len(name) < 10 else f"{name[:10]}...",
+        "amount": amount,
+        "color": color or OTHER_COLOR,
+    }
+
+
+def spending_by_category(user, month, top=None, series=False):
+    """
+    Expenses of `user` per category in the month starting on `month`,
+    largest first, read from the rollup. With `top`, categories past the
+    first `top` are folded into one "Other" item. With `series`, each item
+    also carries its per-day amounts (one extra grouped query).
+    """
+    rows = (
+        MonthlyCategoryTotal.objects.filter(
+            user=user, month=month, category__type=Category.TYPE_EXPENSE
+        )
+        .exclude(count=0)
+        .values_list("category_id", "category__name", "category__color", "total")
+        .order_by("total")  # expense totals are negative
+    )
+    items = [
+        _spending_item(category_id, name, -total, color)
+        for category_id, name, color, total in rows
+    ]
+
+    folded = set()
+    if top is not None and len(items) > top:
+        rest = items[top:]
+        items = items[:top]
+        folded = {item["category"] for item in rest}
+        other = _spending_item(None, "Other", sum(i["amount"] for i in rest), None)
+        items.append(other)
+
+    if series:
+        by_category = {item["category"]: item for item in items}
+        for item in items:
+            item["series"] = []
+        daily = (
+            Transaction.objects.filter(
+                user=user,
+                date__range=(month, month_end(month)),
+                category__type=Category.TYPE_EXPENSE,
+            )
+            .values("category_id", "date")
+            .annotate(amount=Sum("amount"))
+            .values_list("category_id", "date", "amount")
+            .order_by("date")
+        )
+        for category_id, date, amount in daily:
+            key = None if category_id in folded else category_id
+            item = by_category.get(key)
+            if item is None:
+                # written after the rollup was read (or missing from it):
+                # not among the items, so it gets no series either
+                continue
+            target = item["series"]
+            if target and target[-1]["date"] == date:
+                target[-1]["amount"] += amount
+            else:
+                target.append({"date": date, "amount": amount})
+    return items
@@ -0,0 +1,106 @@
+# backend/finance/scheduler.py
+import datetime
+import heapq
+import logging
+import time
+from django.db import DatabaseError, close_old_connections
+from django.db.models import Max
+from django.utils import timezone
+from .models import RecurringTransaction
+from .recurring import RECURRING_BATCH_SIZE, process_recurring_parallel
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POLL_INTERVAL = 60.0
+
+# updated_at is taken before the writing transaction commits, so changes
+# are re-read with this much overlap to catch late commits
+COMMIT_MARGIN = datetime.timedelta(minutes=5)
+
+
+class RecurringScheduler:
+    """
+    Wakes up when recurring rules fall due instead of on a fixed timer.
+
+    Keeps a heap of the distinct upcoming next_date values and sleeps until
+    the earliest one starts (local midnight), then posts everything due.
+    Meanwhile each poll reads the dates of rules created or edited since
+    the newest updated_at it has seen, less COMMIT_MARGIN; the engine sets
+    updated_at too, so advanced rules are picked up the same way. Dates of deleted or edited rules stay in
+    the heap and only cause a wake-up that finds nothing to post.
+    """
+
+    def __init__(
+        self,
+        poll_interval=DEFAULT_POLL_INTERVAL,
+        workers=1,
+        batch_size=RECURRING_BATCH_SIZE,
+    ):
+        self.poll_interval = poll_interval
+        self.workers = workers
+        self.batch_size = batch_size
+        self.heap = []
+        self.queued = set()
+        self.version = None
+
+    def push(self, date):
+        if date not in self.queued:
+            self.queued.add(date)
+            heapq.heappush(self.heap, date)
+
+    def refresh(self):
+        """
+        Queue the dates of rules changed since the last poll; returns whether
+        a new date was queued. The window always reaches COMMIT_MARGIN back,
+        so a rule stamped earlier than the newest seen but committed later
+        is still picked up.
+        """
+        changed = RecurringTransaction.objects.order_by()
+        if self.version is not None:
+            changed = changed.filter(updated_at__gte=self.version - COMMIT_MARGIN)
+        queued = False
+        for date, latest in changed.values_list("next_date").annotate(
+            latest=Max("updated_at")
+        ):
+            if date not in self.queued:
+                self.push(date)
+                queued = True
+            if self.version is None or latest > self.version:
+                self.version = latest
+        return queued
+
+    def run_due(self, today):
+        """Post everything due by `today`; returns (rules, transactions)."""
+        while self.heap and self.heap[0] <= today:
+            self.queued.discard(heapq.heappop(self.heap))
+        return process_recurring_parallel(
+            self.workers, today=today, batch_size=self.batch_size
+        )
+
+    def step(self):
+        """One iteration: refresh, post what is due, return seconds to sleep."""
+        self.refresh()
+        today = timezone.localdate()
+        if self.heap and self.heap[0] <= today:
+            rules, posted = self.run_due(today)
+            logger.info(f"Posted {posted} recurring transactions for {rules} rules.")
+            return 0
+        if not self.heap:
+            return self.poll_interval
+        wake = timezone.make_aware(
+            datetime.datetime.combine(self.heap[0], datetime.time.min)
+        )
+        return max(0, min(self.poll_interval, (wake - timezone.now()).total_seconds()))
+
+    def run_forever(self):
+        while True:
+            # drop connections the database closed while we slept
+            close_old_connections()
+            try:
+                wait = self.step()
+            except DatabaseError:
+                # e.g. a database restart; try again after a poll interval
+                logger.exception("Recurring scheduler step failed")
+                close_old_connections()
+                wait = self.poll_interval
+            time.sleep(wait)
@@ -1,5 +1,13 @@
 from rest_framework import serializers
-from .models import Account, Category, Transaction, Budget, RecurringTransaction
+from .snapshots import shift_snapshots
+from .models import (
+    Account,
+    Category,
+    Transaction,
+    Budget,
+    RecurringTransaction,
+    ImportJob,
+)
 
 
 class AccountSerializer(serializers.ModelSerializer):
@@ -15,6 +23,18 @@ class AccountSerializer(serializers.ModelSerializer):
             "updated_at",
         ]
 
+    def update(self, instance, validated_data):
+        """
+        A balance typed in by the user is a correction of the starting
+        point, so move opening_balance with it; otherwise the reconciler
+        would undo the edit.
+        """
+        if "balance" in validated_data and instance.opening_balance is not None:
+            delta = validated_data["balance"] - instance.balance
+            instance.opening_balance += delta
+            shift_snapshots(instance.pk, delta)
+        return super().update(instance, validated_data)
+
 
 class CategorySerializer(serializers.ModelSerializer):
     class Meta:
@@ -103,3 +123,22 @@ class RecurringTransactionSerializer(serializers.ModelSerializer):
 
         validated_data["next_date"] = validated_data["start_date"]
         return super().create(validated_data)
+
+
+class ImportJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ImportJob
+        fields = [
+            "id",
+            "status",
+            "rows_processed",
+            "created",
+            "skipped",
+            "duplicates",
+            "errors",
+            "detail",
+            "created_at",
+            "started_at",
+            "finished_at",
+        ]
+        read_only_fields = fields
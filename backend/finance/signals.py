@@ -1,9 +1,28 @@
 # backend/finance/signals.py
 from decimal import Decimal
-from django.db.models import F
-from django.db.models.signals import pre_save, post_save, post_delete
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import F, QuerySet
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
 from django.dispatch import receiver
-from .models import Transaction, Account
+from .models import (
+    Transaction,
+    Account,
+    Category,
+    Budget,
+    RecurringTransaction,
+    DataVersion,
+)
+from .rollups import apply_rollup_delta, rebuild_monthly_totals
+from .snapshots import apply_snapshot_delta, as_date
+from .versioning import bump_data_version
+
+
+def _effect(amount, category_type):
+    amt = amount or Decimal("0.00")
+    if category_type == "expense":
+        return -amt
+    return amt
 
 
 def _transaction_effect(tx):
@@ -15,31 +34,54 @@ def _transaction_effect(tx):
       - if tx.category is present: category.type determines sign
       - else: use amount sign (negative => expense)
     """
-    amt = tx.amount or Decimal("0.00")
-    if tx.category is not None:
-        if getattr(tx.category, "type", "") == "expense":
-            return -amt
-        else:
-            return amt
-    # fallback: amount sign
-    return amt
+    category_type = getattr(tx.category, "type", "") if tx.category_id else None
+    return _effect(tx.amount, category_type)
+
+
+def _original_category_type(instance, category_id):
+    """
+    Type of the category the row had before this save. Free when the
+    category is unchanged (it is the instance's own, usually select_related,
+    category); one indexed lookup when the category was switched.
+    """
+    if category_id is None:
+        return None
+    if category_id == instance.category_id:
+        return instance.category.type
+    return (
+        Category.objects.filter(pk=category_id).values_list("type", flat=True).first()
+    )
 
 
 @receiver(pre_save, sender=Transaction)
 def finance_transaction_pre_save(sender, instance, **kwargs):
     """
     Save the previous state so post_save can compute diffs.
-    Attach as _old_instance attribute on instance.
+    Attach as _old_state on instance, taken from the values captured when
+    the instance was loaded (Transaction.from_db); the row is only re-read
+    for instances that were not loaded from the database.
     """
     if not instance.pk:
-        instance._old_instance = None
+        instance._old_state = None
+        return
+
+    original = instance.tracked_original()
+    if original is None:
+        instance._old_state = (
+            sender.objects.filter(pk=instance.pk)
+            .values("account_id", "category_id", "amount", "date", "category__type")
+            .first()
+        )
+        if instance._old_state is not None:
+            instance._old_state["category_type"] = instance._old_state.pop(
+                "category__type"
+            )
         return
-    try:
-        instance._old_instance = sender.objects.select_related(
-            "account", "category"
-        ).get(pk=instance.pk)
-    except sender.DoesNotExist:
-        instance._old_instance = None
+
+    instance._old_state = {
+        **original,
+        "category_type": _original_category_type(instance, original["category_id"]),
+    }
 
 
 @receiver(post_save, sender=Transaction)
@@ -51,26 +93,27 @@ def finance_transaction_post_save(sender, instance, created, **kwargs):
     # compute new effect
     new_effect = _transaction_effect(instance)
 
-    if created:
-        # apply new effect to the instance.account
-        Account.objects.filter(pk=instance.account.pk).update(
-            balance=F("balance") + new_effect
-        )
-        return
-
-    old = getattr(instance, "_old_instance", None)
+    old = None if created else getattr(instance, "_old_state", None)
     if old is None:
-        # fallback: recompute by reversing all transactions for account (rare)
-        Account.objects.filter(pk=instance.account.pk).update(
+        # new row (or one that was not there before): apply new effect
+        Account.objects.filter(pk=instance.account_id).update(
             balance=F("balance") + new_effect
         )
+        apply_snapshot_delta(instance.account_id, instance.date, new_effect)
+        apply_rollup_delta(
+            instance.user_id,
+            as_date(instance.date),
+            instance.category_id,
+            new_effect,
+            1,
+        )
         return
 
-    old_effect = _transaction_effect(old)
+    old_effect = _effect(old["amount"], old["category_type"])
 
-    # if account changed, revert old_effect on old.account and apply new_effect on new account
-    old_account_pk = old.account.pk
-    new_account_pk = instance.account.pk
+    # if account changed, revert old_effect on old account and apply new_effect on new account
+    old_account_pk = old["account_id"]
+    new_account_pk = instance.account_id
 
     if old_account_pk == new_account_pk:
         diff = new_effect - old_effect
@@ -88,12 +131,117 @@ def finance_transaction_post_save(sender, instance, created, **kwargs):
             balance=F("balance") + new_effect
         )
 
+    # the daily snapshots also care about the date, so move the effect
+    # off the old day and onto the new one
+    if (old_account_pk, as_date(old["date"])) != (
+        new_account_pk,
+        as_date(instance.date),
+    ):
+        apply_snapshot_delta(old_account_pk, old["date"], -old_effect)
+        apply_snapshot_delta(new_account_pk, instance.date, new_effect)
+    else:
+        apply_snapshot_delta(new_account_pk, instance.date, new_effect - old_effect)
+
+    # same for the monthly rollup, keyed on month and category
+    old_date, new_date = as_date(old["date"]), as_date(instance.date)
+    if (old_date.replace(day=1), old["category_id"]) != (
+        new_date.replace(day=1),
+        instance.category_id,
+    ):
+        apply_rollup_delta(
+            instance.user_id, old_date, old["category_id"], -old_effect, -1
+        )
+        apply_rollup_delta(
+            instance.user_id, new_date, instance.category_id, new_effect, 1
+        )
+    else:
+        apply_rollup_delta(
+            instance.user_id, new_date, instance.category_id, new_effect - old_effect, 0
+        )
+
+
+def _origin_model(origin):
+    if isinstance(origin, QuerySet):
+        return origin.model
+    return type(origin) if origin is not None else None
+
+
+def _deleted_with_parent(origin):
+    """
+    True when a transaction is being removed by a cascade from its account
+    or user, whose derived rows are going away in the same delete.
+    """
+    return _origin_model(origin) not in (None, Transaction)
+
+
+def _deleted_with_user(origin):
+    model = _origin_model(origin)
+    return model is not None and issubclass(model, get_user_model())
+
 
 @receiver(post_delete, sender=Transaction)
-def finance_transaction_post_delete(sender, instance, **kwargs):
+def finance_transaction_post_delete(sender, instance, origin=None, **kwargs):
     """
     Revert the transaction effect on account when a transaction is deleted.
     """
     effect = _transaction_effect(instance)
     # revert = subtract effect
-    Account.objects.filter(pk=instance.account.pk).update(balance=F("balance") - effect)
+    Account.objects.filter(pk=instance.account_id).update(balance=F("balance") - effect)
+    if not _deleted_with_parent(origin):
+        apply_snapshot_delta(instance.account_id, instance.date, -effect)
+    if not _deleted_with_user(origin):
+        apply_rollup_delta(
+            instance.user_id, as_date(instance.date), instance.category_id, -effect, -1
+        )
+
+
+@receiver(post_save, sender=Category)
+def finance_category_post_save(sender, instance, created, update_fields, **kwargs):
+    """
+    A changed type flips the sign of the category's totals in every month,
+    so rebuild its rollup rows (finance_data_changed bumps the versions).
+    Renames and color changes leave the totals alone.
+    """
+    if created or (update_fields is not None and "type" not in update_fields):
+        return
+    if instance.type_changed():
+        rebuild_monthly_totals(category_ids=[instance.pk])
+
+
+@receiver(pre_delete, sender=Category)
+def finance_category_pre_delete(sender, instance, origin=None, **kwargs):
+    # the category's rollup rows cascade away while its transactions become
+    # uncategorized without signals; remember whose totals to rebuild
+    instance._rollup_users = (
+        []
+        if _deleted_with_user(origin)
+        else list(
+            instance.monthly_totals.order_by()
+            .values_list("user_id", flat=True)
+            .distinct()
+        )
+    )
+
+
+@receiver(post_delete, sender=Category)
+def finance_category_post_delete(sender, instance, **kwargs):
+    users = getattr(instance, "_rollup_users", [])
+    if users:
+        rebuild_monthly_totals(user_ids=users)
+
+
+def finance_data_changed(sender, instance, origin=None, **kwargs):
+    """Bump the owner's data version (everyone's for a shared category)."""
+    if not _deleted_with_user(origin):
+        bump_data_version(instance.user_id)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def finance_user_post_save(sender, instance, created, **kwargs):
+    if created:
+        DataVersion.objects.get_or_create(user=instance)
+
+
+for model in (Transaction, Account, Category, Budget, RecurringTransaction):
+    post_save.connect(finance_data_changed, sender=model)
+    post_delete.connect(finance_data_changed, sender=model)
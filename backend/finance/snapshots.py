@@ -0,0 +1,170 @@
+# backend/finance/snapshots.py
+import datetime
+from decimal import Decimal
+from django.db import IntegrityError, transaction
+from django.db.models import F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from .balances import effect_expression
+from .models import Account, AccountBalanceSnapshot, Transaction
+
+ZERO = Decimal("0.00")
+
+
+def as_date(value):
+    """Normalize what may be assigned to Transaction.date to a date."""
+    return Transaction._meta.get_field("date").to_python(value)
+
+
+def _balance_before(account_id, date):
+    """Balance at the end of the day before `date`."""
+    previous = (
+        AccountBalanceSnapshot.objects.filter(account_id=account_id, date__lt=date)
+        .order_by("-date")
+        .values_list("balance", flat=True)
+        .first()
+    )
+    if previous is not None:
+        return previous
+    opening = (
+        Account.objects.filter(pk=account_id)
+        .values_list("opening_balance", flat=True)
+        .first()
+    )
+    return opening or ZERO
+
+
+def _balances_before(account_ids, date):
+    """_balance_before for many accounts in one query, as {account_id: balance}."""
+    previous = (
+        AccountBalanceSnapshot.objects.filter(account_id=OuterRef("pk"), date__lt=date)
+        .order_by("-date")
+        .values("balance")[:1]
+    )
+    rows = (
+        Account.objects.filter(pk__in=account_ids)
+        .annotate(before=Coalesce(Subquery(previous), "opening_balance"))
+        .values_list("pk", "before")
+    )
+    return {pk: before or ZERO for pk, before in rows}
+
+
+def apply_snapshot_delta(account_id, date, delta):
+    """
+    Record a change of `delta` to an account's balance on `date`: make sure
+    that day has a snapshot, then shift it and every later one.
+    """
+    if not delta:
+        return
+    date = as_date(date)
+    with transaction.atomic(savepoint=False):
+        if not AccountBalanceSnapshot.objects.filter(
+            account_id=account_id, date=date
+        ).exists():
+            try:
+                with transaction.atomic():
+                    AccountBalanceSnapshot.objects.create(
+                        account_id=account_id,
+                        date=date,
+                        balance=_balance_before(account_id, date),
+                    )
+            except IntegrityError:
+                pass  # created concurrently; the update below applies to it
+        AccountBalanceSnapshot.objects.filter(
+            account_id=account_id, date__gte=date
+        ).update(balance=F("balance") + delta)
+
+
+def shift_snapshots(account_id, delta):
+    """Move an account's whole history, e.g. after its opening balance changed."""
+    if delta:
+        AccountBalanceSnapshot.objects.filter(account_id=account_id).update(
+            balance=F("balance") + delta
+        )
+
+
+def rebuild_snapshots(account_ids, since=None):
+    """
+    Recompute the snapshots of `account_ids` from `since` (or from the
+    first transaction) onwards with one grouped aggregate, replacing the
+    existing rows. Used by bulk writers and the backfill command.
+    """
+    account_ids = list(account_ids)
+    if not account_ids:
+        return 0
+    since = as_date(since) if since is not None else None
+
+    transactions = Transaction.objects.filter(account_id__in=account_ids)
+    snapshots = AccountBalanceSnapshot.objects.filter(account_id__in=account_ids)
+    if since is not None:
+        transactions = transactions.filter(date__gte=since)
+        snapshots = snapshots.filter(date__gte=since)
+
+    daily = (
+        transactions.order_by()
+        .values("account_id", "date")
+        .annotate(total=Sum(effect_expression()))
+        .order_by("account_id", "date")
+        .values_list("account_id", "date", "total")
+    )
+
+    with transaction.atomic():
+        if since is None:
+            base = dict(
+                Account.objects.filter(pk__in=account_ids).values_list(
+                    "pk", "opening_balance"
+                )
+            )
+        else:
+            base = _balances_before(account_ids, since)
+
+        snapshots.delete()
+        running = {}
+        rows = []
+        for account_id, date, total in daily.iterator():
+            running[account_id] = running.get(account_id, base[account_id] or ZERO)
+            running[account_id] += total
+            rows.append(
+                AccountBalanceSnapshot(
+                    account_id=account_id, date=date, balance=running[account_id]
+                )
+            )
+        AccountBalanceSnapshot.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def balance_series(accounts, start, end):
+    """
+    Daily end-of-day balances of each account between `start` and `end`
+    (inclusive), read from snapshots only.
+    Returns ({account_id: [balance per day]}, [dates]).
+    """
+    days = (end - start).days + 1
+    dates = [start + datetime.timedelta(days=i) for i in range(days)]
+    account_ids = [account.pk for account in accounts]
+
+    # the carried-in balance: last snapshot before the range, per account
+    opening = {account.pk: account.opening_balance or ZERO for account in accounts}
+    opening.update(
+        AccountBalanceSnapshot.objects.filter(
+            account_id__in=account_ids, date__lt=start
+        )
+        .order_by("account_id", "-date")
+        .distinct("account_id")
+        .values_list("account_id", "balance")
+    )
+
+    changes = {}
+    for account_id, date, balance in AccountBalanceSnapshot.objects.filter(
+        account_id__in=account_ids, date__range=(start, end)
+    ).values_list("account_id", "date", "balance"):
+        changes[(account_id, date)] = balance
+
+    series = {}
+    for account_id in account_ids:
+        balance = opening[account_id]
+        points = []
+        for date in dates:
+            balance = changes.get((account_id, date), balance)
+            points.append(balance)
+        series[account_id] = points
+    return series, dates
@@ -0,0 +1,23 @@
+# backend/finance/storage.py
+import os
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class PrivateUploadStorage(FileSystemStorage):
+    """
+    Stores uploads under IMPORT_UPLOAD_ROOT, outside MEDIA_ROOT, so raw
+    bank statements are never served by the static/media views. The
+    location is read from settings on every access, so overriding the
+    setting (e.g. in tests) takes effect immediately.
+    """
+
+    @property
+    def base_location(self):
+        return settings.IMPORT_UPLOAD_ROOT
+
+    @property
+    def location(self):
+        return os.path.abspath(self.base_location)
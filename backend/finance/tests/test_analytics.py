@@ -0,0 +1,612 @@
+import datetime
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from rest_framework.test import APIClient
+from finance.models import (
+    Account,
+    AccountBalanceSnapshot,
+    Budget,
+    Category,
+    MonthlyCategoryTotal,
+    RecurringTransaction,
+    Transaction,
+)
+from finance import signals
+from finance.budgets import evaluate_periods
+from finance.cache import AnalyticsCache, analytics_cache
+from finance.forecast import expand_rules, forecast_balances
+from finance.ledger import bulk_post_transactions
+from finance.rollups import next_month
+from finance.trends import GRANULARITIES, bucket_count, bucket_starts
+from decimal import Decimal
+
+User = get_user_model()
+
+
+def _snapshots(account):
+    return list(
+        AccountBalanceSnapshot.objects.filter(account=account).values_list(
+            "date", "balance"
+        )
+    )
+
+
+@pytest.mark.django_db
+def test_balance_snapshots_follow_transaction_writes():
+    u = User.objects.create_user("snap", password="pass1234")
+    acc = Account.objects.create(
+        user=u, name="Bank", account_type="bank", balance=Decimal("100.00")
+    )
+    food = Category.objects.create(user=u, name="Food", type="expense")
+    d1, d2, d3 = (datetime.date(2025, 3, d) for d in (1, 5, 9))
+
+    tx = Transaction.objects.create(
+        user=u, account=acc, category=food, amount=Decimal("10.00"), date=d2
+    )
+    Transaction.objects.create(
+        user=u, account=acc, category=food, amount=Decimal("5.00"), date=d3
+    )
+    assert _snapshots(acc) == [(d2, Decimal("90.00")), (d3, Decimal("85.00"))]
+
+    # moving a transaction earlier changes every day from the new date on
+    tx.date = d1
+    tx.save()
+    assert _snapshots(acc) == [
+        (d1, Decimal("90.00")),
+        (d2, Decimal("90.00")),
+        (d3, Decimal("85.00")),
+    ]
+
+    tx.delete()
+    assert _snapshots(acc)[-1] == (d3, Decimal("95.00"))
+
+    bulk_post_transactions(
+        [
+            Transaction(
+                user=u, account=acc, category=food, amount=Decimal("1.00"), date=d2
+            )
+        ]
+    )
+    incremental = _snapshots(acc)
+    assert incremental[-1] == (d3, Decimal("94.00"))
+
+    # a full rebuild agrees with the incrementally maintained rows
+    AccountBalanceSnapshot.objects.all().delete()
+    call_command("backfill_balance_snapshots")
+    rebuilt = dict(_snapshots(acc))
+    assert all(rebuilt.get(date, balance) == balance for date, balance in incremental)
+    assert rebuilt[d3] == Decimal("94.00")
+
+    # deleting the account takes its transactions and snapshots with it
+    acc.delete()
+    assert not AccountBalanceSnapshot.objects.exists()
+
+
+@pytest.mark.django_db
+def test_balance_history_endpoint_carries_balances_forward():
+    u = User.objects.create_user("hist", password="pass1234")
+    bank = Account.objects.create(
+        user=u, name="Bank", account_type="bank", balance=Decimal("100.00")
+    )
+    Account.objects.create(
+        user=u, name="Cash", account_type="cash", balance=Decimal("20.00")
+    )
+    pay = Category.objects.create(user=u, name="Pay", type="income")
+    Transaction.objects.create(
+        user=u,
+        account=bank,
+        category=pay,
+        amount=Decimal("50.00"),
+        date=datetime.date(2025, 3, 2),
+    )
+    client = APIClient()
+    client.force_authenticate(u)
+
+    resp = client.get(
+        "/api/analytics/balance-history/", {"start": "2025-03-01", "end": "2025-03-03"}
+    )
+    assert resp.status_code == 200
+    bank_series = [p["balance"] for p in resp.data["accounts"][0]["series"]]
+    assert bank_series == [Decimal("100.00"), Decimal("150.00"), Decimal("150.00")]
+    assert [p["balance"] for p in resp.data["total"]] == [
+        Decimal("120.00"),
+        Decimal("170.00"),
+        Decimal("170.00"),
+    ]
+
+    resp = client.get("/api/analytics/balance-history/", {"start": "bad"})
+    assert resp.status_code == 400
+    # the default year-long window would start before year 1
+    resp = client.get("/api/analytics/balance-history/", {"end": "0001-01-01"})
+    assert resp.status_code == 400
+    resp = client.get(
+        "/api/analytics/balance-history/", {"start": "9999-12-30", "end": "9999-12-31"}
+    )
+    assert resp.status_code == 200
+
+
+@pytest.mark.django_db
+def test_summary_is_cached_until_a_write(django_assert_num_queries):
+    u = User.objects.create_user("summ", password="pass1234")
+    acc = Account.objects.create(
+        user=u, name="Bank", account_type="bank", balance=Decimal("100.00")
+    )
+    food = Category.objects.create(user=u, name="Food", type="expense")
+    pay = Category.objects.create(user=u, name="Pay", type="income")
+    march = datetime.date(2025, 3, 10)
+    Transaction.objects.create(
+        user=u, account=acc, category=pay, amount=Decimal("50.00"), date=march
+    )
+    Transaction.objects.create(
+        user=u, account=acc, category=food, amount=Decimal("20.00"), date=march
+    )
+    client = APIClient()
+    client.force_authenticate(u)
+    params = {"year": 2025, "month": 3}
+
+    # the data version lookup for the ETag, then the balance and month totals
+    with django_assert_num_queries(3):
+        resp = client.get("/api/analytics/summary/", params)
+    assert resp["X-Analytics-Cache"] == "miss"
+    assert resp.data == {
+        "total_balance": Decimal("130.00"),
+        "monthly_income": Decimal("50.00"),
+        "monthly_expenses": Decimal("20.00"),
+    }
+    hits = analytics_cache.stats()["hits"]
+    with django_assert_num_queries(1):
+        resp = client.get("/api/analytics/summary/", params)
+    assert resp["X-Analytics-Cache"] == "hit"
+    assert analytics_cache.stats()["hits"] == hits + 1
+
+    # the write bumps the data version the entry is keyed on
+    Transaction.objects.create(
+        user=u, account=acc, category=food, amount=Decimal("1.00"), date=march
+    )
+    with django_assert_num_queries(3):
+        resp = client.get("/api/analytics/summary/", params)
+    assert resp["X-Analytics-Cache"] == "miss"
+    assert resp.data["monthly_expenses"] == Decimal("21.00")
+    assert resp.data["total_balance"] == Decimal("129.00")
+
+
+def _rollup(user):
+    return {
+        (row.month, row.category_id): (row.total, row.count)
+        for row in MonthlyCategoryTotal.objects.filter(user=user).exclude(count=0)
+    }
+
+
+@pytest.mark.django_db
+def test_monthly_rollup_follows_writes_and_matches_rebuild(monkeypatch):
+    u = User.objects.create_user("roll", password="pass1234")
+    acc = Account.objects.create(user=u, name="Bank", account_type="bank")
+    food = Category.objects.create(user=u, name="Food", type="expense")
+    fun = Category.objects.create(user=u, name="Fun", type="expense")
+    march, april = datetime.date(2025, 3, 1), datetime.date(2025, 4, 1)
+
+    tx = Transaction.objects.create(
+        user=u, account=acc, category=food, amount=Decimal("10.00"), date=march
+    )
+    Transaction.objects.create(
+        user=u, account=acc, category=food, amount=Decimal("5.00"), date=march
+    )
+    tx.category = fun
+    tx.date = april
+    tx.save()
+    bulk_post_transactions(
+        [Transaction(user=u, account=acc, category=None, amount=3, date=april)]
+    )
+    assert _rollup(u) == {
+        (march, food.pk): (Decimal("-5.00"), 1),
+        (april, fun.pk): (Decimal("-10.00"), 1),
+        (april, None): (Decimal("3.00"), 1),
+    }
+
+    # renames leave the totals alone; only a type flip rebuilds them
+    rebuilds = []
+    rebuild = signals.rebuild_monthly_totals
+    monkeypatch.setattr(
+        signals,
+        "rebuild_monthly_totals",
+        lambda **kw: rebuilds.append(kw) or rebuild(**kw),
+    )
+    food.name, food.color = "Groceries", "#00ff00"
+    food.save()
+    Category.objects.get(pk=food.pk).save()
+    assert rebuilds == []
+    food.type = "income"
+    food.save()
+    assert rebuilds == [{"category_ids": [food.pk]}]
+    assert _rollup(u)[(march, food.pk)] == (Decimal("5.00"), 1)
+    food.save()
+    assert len(rebuilds) == 1
+
+    # deleting a category leaves its transactions uncategorized, which
+    # count with the sign of their amount
+    fun.delete()
+    assert _rollup(u)[(april, None)] == (Decimal("13.00"), 2)
+
+    incremental = _rollup(u)
+    call_command("rebuild_monthly_totals")
+    assert _rollup(u) == incremental
+
+
+@pytest.mark.django_db
+def test_budget_progress_counts_only_days_inside_the_budget():
+    u = User.objects.create_user("budg", password="pass1234")
+    acc = Account.objects.create(user=u, name="Bank", account_type="bank")
+    food = Category.objects.create(user=u, name="Food", type="expense")
+    for day, amount in (("2025-02-27", 1), ("2025-03-03", 10), ("2025-04-20", 100)):
+        Transaction.objects.create(
+            user=u, account=acc, category=food, amount=Decimal(amount), date=day
+        )
+    # Feb 28 - Apr 10: the Feb 27 and Apr 20 rows fall outside the budget,
+    # while the month spending breakdown still counts all of April
+    Budget.objects.create(
+        user=u,
+        category=food,
+        amount=Decimal("50.00"),
+        start_date=datetime.date(2025, 2, 28),
+        end_date=datetime.date(2025, 4, 10),
+    )
+    client = APIClient()
+    client.force_authenticate(u)
+
+    resp = client.get("/api/analytics/budget-progress/", {"year": 2025, "month": 3})
+    assert resp.status_code == 200
+    assert Decimal(resp.data[0]["spent"]) == Decimal("10.00")
+
+    resp = client.get(
+        "/api/analytics/spending-by-category/", {"year": 2025, "month": 4}
+    )
+    assert [(row["fullName"], row["amount"]) for row in resp.data] == [
+        ("Food", Decimal("100.00"))
+    ]
+
+
+@pytest.mark.django_db
+def test_trend_zero_fills_buckets(django_assert_num_queries):
+    u = User.objects.create_user("trend", password="pass1234")
+    acc = Account.objects.create(user=u, name="Bank", account_type="bank")
+    food = Category.objects.create(user=u, name="Food", type="expense")
+    pay = Category.objects.create(user=u, name="Pay", type="income")
+    for day, category, amount in (
+        ("2025-01-15", pay, 100),
+        ("2025-01-16", food, 30),
+        ("2025-03-03", food, 5),
+    ):
+        Transaction.objects.create(
+            user=u, account=acc, category=category, amount=amount, date=day
+        )
+    client = APIClient()
+    client.force_authenticate(u)
+
+    # the data version lookup, then one grouped query
+    with django_assert_num_queries(2):
+        resp = client.get("/api/analytics/trend/", {"from": "2025-01", "to": "2025-03"})
+    assert [
+        (b["start"], b["income"], b["expense"], b["net"]) for b in resp.data["buckets"]
+    ] == [
+        (datetime.date(2025, 1, 1), Decimal("100.00"), Decimal("30.00"), 70),
+        (datetime.date(2025, 2, 1), 0, 0, 0),
+        (datetime.date(2025, 3, 1), 0, Decimal("5.00"), -5),
+    ]
+
+    resp = client.get(
+        "/api/analytics/trend/",
+        {"from": "2025-03", "to": "2025-03", "granularity": "week"},
+    )
+    weeks = resp.data["buckets"]
+    # March 2025 starts on a Saturday, so the first week starts in February
+    assert weeks[0]["start"] == datetime.date(2025, 2, 24)
+    assert len(weeks) == 6
+    assert [w["expense"] for w in weeks if w["expense"]] == [Decimal("5.00")]
+
+    resp = client.get("/api/analytics/trend/", {"granularity": "year"})
+    assert resp.status_code == 400
+
+    # the edges of the calendar: served or refused, never a 500
+    resp = client.get(
+        "/api/analytics/trend/",
+        {"from": "9999-01", "to": "9999-12", "granularity": "week"},
+    )
+    assert resp.data["buckets"][-1]["start"] == datetime.date(9999, 12, 27)
+    resp = client.get("/api/analytics/trend/", {"from": "9999-12", "to": "9999-12"})
+    assert len(resp.data["buckets"]) == 1
+    assert client.get("/api/analytics/trend/", {"to": "0001-01"}).status_code == 400
+    # an oversized range is refused; its buckets are counted, not listed
+    huge = {"from": "0001-01", "to": "9999-11", "granularity": "day"}
+    assert client.get("/api/analytics/trend/", huge).status_code == 400
+    for granularity in GRANULARITIES:
+        start, end = datetime.date(2024, 12, 30), datetime.date(2025, 3, 2)
+        assert bucket_count(start, end, granularity) == len(
+            bucket_starts(start, end, granularity)
+        )
+
+
+@pytest.mark.django_db
+def test_budget_evaluator_handles_year_boundary_and_batches(
+    django_assert_num_queries,
+):
+    u = User.objects.create_user("eval", password="pass1234")
+    other = User.objects.create_user("eval2", password="pass1234")
+    acc = Account.objects.create(user=u, name="Bank", account_type="bank")
+    groceries = Category.objects.get(name="Groceries", user__isnull=True)
+    for day, amount in (("2024-12-20", 7), ("2025-01-10", 3), ("2025-02-01", 50)):
+        Transaction.objects.create(
+            user=u, account=acc, category=groceries, amount=amount, date=day
+        )
+    # same shared category, another user: must not count
+    Transaction.objects.create(
+        user=other,
+        account=Account.objects.create(user=other, name="B", account_type="bank"),
+        category=groceries,
+        amount=1000,
+        date="2025-01-05",
+    )
+    winter = Budget.objects.create(
+        user=u,
+        category=groceries,
+        amount=100,
+        start_date=datetime.date(2024, 12, 15),
+        end_date=datetime.date(2025, 1, 15),
+    )
+    for month in range(1, 13):
+        start = datetime.date(2025, month, 1)
+        Budget.objects.create(
+            user=u,
+            category=groceries,
+            amount=20,
+            start_date=start,
+            end_date=next_month(start) - datetime.timedelta(days=1),
+        )
+
+    periods = list(
+        Budget.objects.exclude(pk=winter.pk)
+        .order_by("start_date")
+        .values_list("start_date", "end_date")
+    )
+    with django_assert_num_queries(1):
+        evaluated = evaluate_periods(u, periods)
+    january = {b.pk: b.spent for b in evaluated[periods[0]]}
+    assert january[winter.pk] == Decimal("10.00")
+    assert len(january) == 2
+    assert [b.spent for b in evaluated[periods[1]]] == [Decimal("50.00")]
+
+    client = APIClient()
+    client.force_authenticate(u)
+    resp = client.get("/api/analytics/budget-progress/", {"year": 2025, "month": 1})
+    assert sorted(Decimal(b["spent"]) for b in resp.data) == [
+        Decimal("3.00"),
+        Decimal("10.00"),
+    ]
+
+
+@pytest.mark.django_db
+def test_spending_by_category_top_other_and_series():
+    u = User.objects.create_user("spend", password="pass1234")
+    acc = Account.objects.create(user=u, name="Bank", account_type="bank")
+    cats = [
+        Category.objects.create(user=u, name=name, type="expense")
+        for name in ("Rent", "Food", "Fun", "Gifts")
+    ]
+    for category, amount, day in (
+        (cats[0], 500, 1),
+        (cats[1], 40, 2),
+        (cats[1], 20, 3),
+        (cats[2], 15, 2),
+        (cats[3], 5, 2),
+    ):
+        Transaction.objects.create(
+            user=u,
+            account=acc,
+            category=category,
+            amount=amount,
+            date=datetime.date(2025, 5, day),
+        )
+    client = APIClient()
+    client.force_authenticate(u)
+    params = {"year": 2025, "month": 5}
+
+    resp = client.get("/api/analytics/spending-by-category/", params)
+    assert [row["fullName"] for row in resp.data] == ["Rent", "Food", "Fun", "Gifts"]
+    assert "legendFontSize" not in resp.data[0] and "series" not in resp.data[0]
+
+    resp = client.get(
+        "/api/analytics/spending-by-category/", {**params, "top": 2, "series": "day"}
+    )
+    assert [(row["fullName"], row["amount"]) for row in resp.data] == [
+        ("Rent", Decimal("500.00")),
+        ("Food", Decimal("60.00")),
+        ("Other", Decimal("20.00")),
+    ]
+    # Fun and Gifts were both spent on the 2nd: one point in Other's series
+    assert resp.data[2]["series"] == [
+        {"date": datetime.date(2025, 5, 2), "amount": Decimal("20.00")}
+    ]
+    assert len(resp.data[1]["series"]) == 2
+
+    resp = client.get("/api/analytics/spending-by-category/", {**params, "top": 0})
+    assert resp.status_code == 400
+
+    # a row the rollup has not seen (bulk_create skips the signals) is
+    # left out of the series rather than failing the request
+    travel = Category.objects.create(user=u, name="Travel", type="expense")
+    Transaction.objects.bulk_create(
+        [
+            Transaction(
+                user=u,
+                account=acc,
+                category=travel,
+                amount=7,
+                date=datetime.date(2025, 5, 4),
+            )
+        ]
+    )
+    resp = client.get(
+        "/api/analytics/spending-by-category/", {**params, "series": "day"}
+    )
+    assert resp.status_code == 200
+    assert "Travel" not in [row["fullName"] for row in resp.data]
+
+
+@pytest.mark.django_db
+def test_dashboard_matches_the_individual_endpoints():
+    u = User.objects.create_user("dash", password="pass1234")
+    acc = Account.objects.create(
+        user=u, name="Bank", account_type="bank", balance=Decimal("10.00")
+    )
+    food = Category.objects.create(user=u, name="Food", type="expense")
+    Transaction.objects.create(
+        user=u, account=acc, category=food, amount=4, date="2025-06-02"
+    )
+    Budget.objects.create(
+        user=u,
+        category=food,
+        amount=50,
+        start_date=datetime.date(2025, 6, 1),
+        end_date=datetime.date(2025, 6, 30),
+    )
+    client = APIClient()
+    client.force_authenticate(u)
+    params = {"year": 2025, "month": 6}
+
+    resp = client.get("/api/analytics/dashboard/", params)
+    assert resp.status_code == 200
+    for section, path in (
+        ("summary", "summary"),
+        ("spending_by_category", "spending-by-category"),
+        ("budget_progress", "budget-progress"),
+        ("recent_transactions", "recent-transactions"),
+    ):
+        assert resp.data[section] == client.get(f"/api/analytics/{path}/", params).data
+    assert resp.data["summary"]["monthly_expenses"] == Decimal("4.00")
+
+    assert client.get("/api/analytics/dashboard/", {"month": 13}).status_code == 400
+    # the last representable month has no next month to count back from
+    last = {"year": 9999, "month": 12, "series": "day"}
+    for path in ("dashboard", "summary", "spending-by-category", "budget-progress"):
+        assert client.get(f"/api/analytics/{path}/", last).status_code == 200
+
+
+def test_analytics_cache_lru_and_single_flight():
+    store = AnalyticsCache(namespace="test:lru", max_entries=2)
+    keys = [store.make_key("view", 1, 1, {"n": [str(i)]}) for i in range(3)]
+    for key in keys:
+        assert store.get_or_compute(key, lambda: ("v", True)) == ("v", False)
+    # the oldest key was evicted from the backend, the others are hits
+    assert store.cache.get(keys[0]) is None
+    assert store.get_or_compute(keys[2], lambda: ("x", True)) == ("v", True)
+    assert store.stats() == {"hits": 1, "misses": 3, "evictions": 1, "entries": 2}
+
+    calls = []
+    started = threading.Event()
+
+    def slow():
+        calls.append(1)
+        started.set()
+        time.sleep(0.2)
+        return "slow", True
+
+    key = store.make_key("view", 1, 2)
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(lambda _: store.get_or_compute(key, slow), range(4)))
+    assert len(calls) == 1
+    assert {value for value, _ in results} == {"slow"}
+
+
+@pytest.mark.django_db
+def test_cached_analytics_view_hits_until_data_changes():
+    u = User.objects.create_user("cached", password="pass1234")
+    acc = Account.objects.create(user=u, name="Bank", account_type="bank")
+    client = APIClient()
+    client.force_authenticate(u)
+    params = {"from": "2025-01", "to": "2025-02"}
+
+    assert client.get("/api/analytics/trend/", params)["X-Analytics-Cache"] == "miss"
+    assert client.get("/api/analytics/trend/", params)["X-Analytics-Cache"] == "hit"
+    pay = Category.objects.create(user=u, name="Pay", type="income")
+    Transaction.objects.create(
+        user=u, account=acc, category=pay, amount=1, date="2025-01-05"
+    )
+    resp = client.get("/api/analytics/trend/", params)
+    assert resp["X-Analytics-Cache"] == "miss"
+    assert resp.data["buckets"][0]["income"] == 1
+
+
+@pytest.mark.django_db
+def test_forecast_expansion_matches_advance_next_date():
+    u = User.objects.create_user("fc", password="pass1234")
+    bank = Account.objects.create(
+        user=u, name="Bank", account_type="bank", balance=Decimal("1000.00")
+    )
+    rent = Category.objects.create(user=u, name="Rent", type="expense")
+    end = datetime.date(2026, 12, 31)
+    rules = [
+        RecurringTransaction.objects.create(
+            user=u,
+            account=bank,
+            category=rent,
+            amount=Decimal("10.00"),
+            start_date=start,
+            next_date=start,
+            frequency=frequency,
+        )
+        for start, frequency in [
+            (datetime.date(2025, 1, 31), "monthly"),
+            (datetime.date(2025, 11, 30), "monthly"),
+            (datetime.date(2026, 12, 20), "weekly"),
+            (datetime.date(2026, 12, 29), "daily"),
+            (datetime.date(2027, 1, 1), "daily"),
+        ]
+    ]
+
+    rule_idx, dates = expand_rules(
+        np.array([r.next_date for r in rules], dtype="datetime64[D]"),
+        np.array([r.frequency for r in rules]),
+        np.datetime64(end),
+    )
+    expanded = sorted(zip(rule_idx.tolist(), (d.item() for d in dates)))
+    expected = []
+    for i, rule in enumerate(rules):
+        while rule.next_date <= end:
+            expected.append((i, rule.next_date))
+            rule.advance_next_date()
+    assert expanded == expected
+    assert (0, datetime.date(2025, 3, 28)) in expanded
+
+    # the loop above left every rule due in 2027; make both daily ones due
+    # on 2026-12-31, i.e. this month
+    RecurringTransaction.objects.filter(frequency="daily").update(
+        next_date=datetime.date(2026, 12, 31)
+    )
+    months, forecast = forecast_balances(u, 2, today=datetime.date(2026, 12, 31))
+    assert months == [datetime.date(2026, 12, 1), datetime.date(2027, 1, 1)]
+    name, balance, series = forecast[bank.pk]
+    # Dec: 2 daily occurrences; Jan: 2 x 31 daily, 5 weekly, 2 monthly
+    assert series == [Decimal("980.00"), Decimal("290.00")]
+    assert balance == Decimal("1000.00")
+    assert not Transaction.objects.exists()
+
+
+@pytest.mark.django_db
+def test_forecast_endpoint():
+    u = User.objects.create_user("fc2", password="pass1234")
+    Account.objects.create(
+        user=u, name="Bank", account_type="bank", balance=Decimal("5.00")
+    )
+    client = APIClient()
+    client.force_authenticate(u)
+    resp = client.get("/api/analytics/forecast/", {"months": "3"})
+    assert resp.status_code == 200
+    assert [p["balance"] for p in resp.data["total"]] == [Decimal("5.00")] * 3
+    assert resp.data["accounts"][0]["name"] == "Bank"
+    for bad in ("0", "61", "x"):
+        resp = client.get("/api/analytics/forecast/", {"months": bad})
+        assert resp.status_code == 400
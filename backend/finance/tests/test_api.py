@@ -1,7 +1,17 @@
 # backend/finance/tests/test_api.py
+import datetime
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from rest_framework.test import APIClient
+from finance.models import Account, Transaction
+from finance.recurring import RECURRING_INLINE_LIMIT, process_recurring
 import pytest
 
+User = get_user_model()
+
 
 @pytest.mark.django_db
 def test_register_and_crud_account():
@@ -45,3 +55,129 @@ def test_register_and_crud_account():
     accounts = resp.json()
     assert isinstance(accounts, list)
     assert any(acc["name"] == "Wallet" for acc in accounts)
+
+
+@pytest.mark.django_db
+def test_etag_answers_304_until_data_changes(django_assert_num_queries):
+    user = User.objects.create_user("etag", password="pass1234")
+    client = APIClient()
+    client.force_authenticate(user)
+
+    resp = client.get("/api/accounts/")
+    etag = resp["ETag"]
+    assert etag.startswith('W/"')
+
+    # one lookup of the data version, no queryset or serializer work
+    with django_assert_num_queries(1):
+        resp = client.get("/api/accounts/", HTTP_IF_NONE_MATCH=etag)
+    assert resp.status_code == 304
+    assert resp["ETag"] == etag
+
+    Account.objects.create(user=user, name="Cash", account_type="cash")
+    resp = client.get("/api/accounts/", HTTP_IF_NONE_MATCH=etag)
+    assert resp.status_code == 200
+    assert resp["ETag"] != etag
+    assert (
+        client.get(
+            "/api/analytics/summary/", HTTP_IF_NONE_MATCH=resp["ETag"]
+        ).status_code
+        == 304
+    )
+
+
+@pytest.mark.django_db
+def test_backdated_recurring_rule_posts_inline_or_defers():
+    user = User.objects.create_user("rec", password="pass1234")
+    acc = Account.objects.create(user=user, name="Cash", account_type="cash")
+    client = APIClient()
+    client.force_authenticate(user)
+    today = timezone.localdate()
+
+    def create(days_back):
+        start = today - datetime.timedelta(days=days_back)
+        return client.post(
+            "/api/recurring-transactions/",
+            {
+                "account": acc.pk,
+                "amount": "1.00",
+                "start_date": start.isoformat(),
+                "frequency": "daily",
+            },
+            format="json",
+        )
+
+    resp = create(2)
+    assert resp.status_code == 201
+    assert resp.data["posted_occurrences"] == 3
+    assert resp.data["pending_occurrences"] == 0
+    assert resp.data["next_date"] == (today + datetime.timedelta(days=1)).isoformat()
+    acc.refresh_from_db()
+    assert acc.balance == Decimal("3.00")
+    notes = set(Transaction.objects.values_list("notes", flat=True))
+    assert notes == {"Recurring: Daily"}
+
+    # a five-year backlog is left to the batch engine
+    resp = create(5 * 365)
+    assert resp.status_code == 201
+    assert resp.data["posted_occurrences"] == 0
+    assert resp.data["pending_occurrences"] == 5 * 365 + 1 > RECURRING_INLINE_LIMIT
+    assert Transaction.objects.count() == 3
+    assert process_recurring() == (1, 5 * 365 + 1)
+    acc.refresh_from_db()
+    assert acc.balance == Decimal("3.00") + 5 * 365 + 1
+
+
+@pytest.mark.django_db
+def test_transactions_are_keyset_paginated():
+    user = User.objects.create_user("pages", password="pass1234")
+    acc = Account.objects.create(user=user, name="Cash", account_type="cash")
+    created = timezone.now()
+    for day in (1, 1, 1, 2, 2, 3, 4):
+        Transaction.objects.create(
+            user=user,
+            account=acc,
+            amount=1,
+            date=datetime.date(2025, 5, day),
+            created_at=created,
+        )
+    expected = list(
+        Transaction.objects.order_by("-date", "-created_at", "-id").values_list(
+            "id", flat=True
+        )
+    )
+    client = APIClient()
+    client.force_authenticate(user)
+
+    # transactions are paged even without params; other lists opt in
+    resp = client.get("/api/transactions/")
+    assert [row["id"] for row in resp.data["results"]] == expected
+    assert resp.data["next"] is None
+    assert [row["id"] for row in client.get("/api/accounts/").data] == [acc.pk]
+
+    seen, url = [], "/api/transactions/?limit=3"
+    with CaptureQueriesContext(connection) as queries:
+        while url:
+            resp = client.get(url)
+            assert resp.status_code == 200
+            seen += [row["id"] for row in resp.data["results"]]
+            url = resp.data["next"]
+    assert seen == expected
+    assert not any("COUNT(" in q["sql"] for q in queries.captured_queries)
+
+    assert client.get("/api/transactions/", {"cursor": "bogus"}).status_code == 404
+    resp = client.get("/api/transactions/", {"limit": "0"})
+    assert len(resp.data["results"]) == len(expected)
+    resp = client.get("/api/transactions/", {"limit": "2"})
+    assert len(resp.data["results"]) == 2
+    resp = client.get("/api/accounts/", {"limit": 10})
+    assert [row["id"] for row in resp.data["results"]] == [acc.pk]
+    assert resp.data["next"] is None
+
+    # editing an account between page fetches does not move it across pages
+    second = Account.objects.create(user=user, name="Bank", account_type="bank")
+    resp = client.get("/api/accounts/", {"limit": 1})
+    assert [row["id"] for row in resp.data["results"]] == [second.pk]
+    acc.name = "Wallet"
+    acc.save()
+    resp = client.get(resp.data["next"])
+    assert [row["id"] for row in resp.data["results"]] == [acc.pk]
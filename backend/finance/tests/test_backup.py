@@ -0,0 +1,103 @@
+import gzip
+import json
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from rest_framework.test import APIClient
+from finance.models import Account, Category, Transaction, Budget, RecurringTransaction
+from decimal import Decimal
+
+User = get_user_model()
+
+
+@pytest.mark.django_db
+def test_backup_and_restore_roundtrip():
+    src = User.objects.create_user("src", password="pass1234")
+    acc = Account.objects.create(
+        user=src, name="Main", account_type="bank", balance=Decimal("100.00")
+    )
+    hobby = Category.objects.create(user=src, name="Hobby", type="expense")
+    salary = Category.objects.get(user__isnull=True, name="Salary")
+    Transaction.objects.create(
+        user=src, account=acc, category=hobby, amount=Decimal("30.00"), notes="x"
+    )
+    Transaction.objects.create(
+        user=src, account=acc, category=salary, amount=Decimal("500.00")
+    )
+    Budget.objects.create(
+        user=src,
+        category=hobby,
+        amount=Decimal("50.00"),
+        start_date="2025-01-01",
+        end_date="2025-01-31",
+    )
+    RecurringTransaction.objects.create(
+        user=src,
+        account=acc,
+        category=salary,
+        amount=Decimal("500.00"),
+        start_date="2025-01-01",
+        next_date="2025-02-01",
+    )
+    client = APIClient()
+    client.force_authenticate(src)
+    archive = b"".join(client.get("/api/backup/").streaming_content)
+
+    dst = User.objects.create_user("dst", password="pass1234")
+    client.force_authenticate(dst)
+    resp = client.post(
+        "/api/backup/", {"file": SimpleUploadedFile("backup.gz", archive)}
+    )
+
+    assert resp.status_code == 201
+    assert resp.json()["restored"]["transactions"] == 2
+    restored = Account.objects.get(user=dst, name="Main")
+    assert restored.balance == Decimal("570.00")
+    txs = Transaction.objects.filter(user=dst, account=restored)
+    assert {tx.category.name for tx in txs} == {"Hobby", "Salary"}
+    # system categories are shared, user categories are copied
+    assert txs.get(category__name="Salary").category_id == salary.pk
+    assert Category.objects.get(user=dst, name="Hobby").pk != hobby.pk
+    assert Budget.objects.get(user=dst).category.user == dst
+    assert RecurringTransaction.objects.get(user=dst).account == restored
+
+    # restoring over existing data needs an explicit replace
+    resp = client.post(
+        "/api/backup/", {"file": SimpleUploadedFile("backup.gz", archive)}
+    )
+    assert resp.status_code == 400
+    resp = client.post(
+        "/api/backup/",
+        {"file": SimpleUploadedFile("backup.gz", archive), "replace": "true"},
+    )
+    assert resp.status_code == 201
+    assert Transaction.objects.filter(user=dst).count() == 2
+    assert Account.objects.get(user=dst, name="Main").balance == Decimal("570.00")
+
+
+@pytest.mark.django_db
+def test_restore_rejects_malformed_archives():
+    user = User.objects.create_user("bad", password="pass1234")
+    client = APIClient()
+    client.force_authenticate(user)
+    header = {"format": "quanta-backup", "version": 2}
+    accounts = {"section": "accounts", "fields": ["id", "name", "account_type"]}
+    transactions = {"section": "transactions", "fields": ["amount", "date"]}
+    archives = [
+        [["not", "a", "header"]],
+        [header, {"fields": []}],
+        [header, {"section": "accounts", "fields": ["id", "nope"]}],
+        [header, accounts, [1, "Main"]],
+        [header, accounts, [1, "Main", "bank"], transactions, ["1.00", "not-a-date"]],
+        [header, accounts, [1, "Main", "bank"], transactions, ["1.00", "2025-01-01"]],
+        [header, accounts, [1, "Main\x00", "bank"]],
+    ]
+    for lines in archives:
+        payload = gzip.compress(
+            "".join(json.dumps(line) + "\n" for line in lines).encode()
+        )
+        resp = client.post(
+            "/api/backup/", {"file": SimpleUploadedFile("backup.gz", payload)}
+        )
+        assert resp.status_code == 400, lines
+    assert not Account.objects.filter(user=user).exists()
@@ -1,6 +1,33 @@
+import datetime
+import gzip
+import io
+import threading
 import pytest
 from django.contrib.auth import get_user_model
-from finance.models import Account, Category, Transaction
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.utils import timezone
+from rest_framework.test import APIClient
+from finance.balances import reconcile_balances
+from finance.dateparse import AmbiguousDateFormat, DateParser
+from finance import importers
+from finance.importers import TransactionImporter
+from finance.management.commands import process_import_jobs
+from finance.models import (
+    Account,
+    AccountBalanceSnapshot,
+    Category,
+    ImportJob,
+    MonthlyCategoryTotal,
+    RecurringTransaction,
+    Transaction,
+)
+from django.db import OperationalError, connections, transaction
+from finance.recurring import process_recurring
+from finance.rollups import rebuild_monthly_totals
+from finance import scheduler as scheduler_module
+from finance.scheduler import RecurringScheduler
+from finance.snapshots import rebuild_snapshots
 from decimal import Decimal
 
 User = get_user_model()
@@ -28,3 +55,617 @@ def test_balance_update_on_create_update_delete():
     tx.delete()
     acc.refresh_from_db()
     assert acc.balance == Decimal("100.00")
+
+
+@pytest.mark.django_db
+def test_import_csv_bulk_creates_rows_and_applies_balances():
+    u = User.objects.create_user("u2", password="pass1234")
+    acc = Account.objects.create(
+        user=u, name="Checking", account_type="bank", balance=Decimal("100.00")
+    )
+    client = APIClient()
+    client.force_authenticate(u)
+    csv_data = (
+        "date,account,category,category_type,amount,notes\n"
+        '2025-01-05,Checking,Salary,income,"$1,000.00",jan\n'
+        "2025-01-06,Checking,Hobbies,expense,40.50,\n"
+        "2025-01-07,Wallet,hobbies,expense,9.50,\n"
+        "not-a-date,Checking,Groceries,expense,1.00,\n"
+        "2025-01-08,Checking,Groceries,expense,abc,\n"
+    )
+    upload = SimpleUploadedFile("tx.csv", csv_data.encode("utf-8"))
+
+    resp = client.post("/api/transactions/import_csv/", {"file": upload})
+
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["created"] == 3
+    assert body["skipped"] == 2
+    assert [e["row"] for e in body["errors"]] == [4, 5]
+    acc.refresh_from_db()
+    assert acc.balance == Decimal("1059.50")
+    wallet = Account.objects.get(user=u, name="Wallet")
+    assert wallet.balance == Decimal("-9.50")
+    assert Category.objects.filter(user=u, name__iexact="hobbies").count() == 1
+    # existing system categories are reused, not copied
+    assert not Category.objects.filter(user=u, name="Salary").exists()
+    assert Transaction.objects.filter(user=u).count() == 3
+
+
+@pytest.mark.django_db
+def test_import_csv_reports_rows_the_database_rejects(monkeypatch):
+    u = User.objects.create_user("u16", password="pass1234")
+    client = APIClient()
+    client.force_authenticate(u)
+    csv_data = (
+        "date,account,category,amount,notes\n"
+        "2025-01-05,Checking,Food,1.00,ok\n"
+        "2025-01-06,Checking,Food,2.00,bad\x00note\n"
+        "2025-01-07,Checking,Food,3.00,ok\n"
+    )
+    upload = SimpleUploadedFile("tx.csv", csv_data.encode("utf-8"))
+    resp = client.post("/api/transactions/import_csv/", {"file": upload})
+    assert resp.status_code == 200
+    body = resp.json()
+    assert (body["created"], body["skipped"]) == (2, 1)
+    assert [e["row"] for e in body["errors"]] == [2]
+
+    # a row only the database refuses is retried alone, not the whole batch
+    build = TransactionImporter.build_transaction
+
+    def unchecked(self, row):
+        tx = build(self, {**row, "notes": ""})
+        tx.notes = row["notes"]
+        return tx
+
+    monkeypatch.setattr(TransactionImporter, "build_transaction", unchecked)
+    upload = SimpleUploadedFile("tx.csv", csv_data.replace("ok", "again").encode())
+    resp = client.post("/api/transactions/import_csv/", {"file": upload})
+    body = resp.json()
+    assert (body["created"], body["skipped"]) == (2, 1)
+    assert [e["row"] for e in body["errors"]] == [2]
+    assert Transaction.objects.filter(user=u).count() == 4
+    assert Account.objects.get(user=u, name="Checking").balance == Decimal("-8.00")
+
+
+@pytest.mark.django_db
+def test_import_stream_commits_chunks_independently(monkeypatch):
+    u = User.objects.create_user("u3", password="pass1234")
+    rows = [
+        {"date": "2025-02-01", "account": "Main", "category": "Salary", "amount": "10"},
+        {"date": "2025-02-02", "account": "Main", "category": "Salary", "amount": "5"},
+        # rows the database would refuse are skipped on their own
+        {"date": "2025-02-03", "account": "Main", "amount": "1", "notes": "a\x00b"},
+        {"date": "bad", "account": "Main", "category": "Salary", "amount": "1"},
+        {"date": "2025-02-04", "account": "Side", "amount": "1"},
+        {"date": "2025-02-05", "account": "Main", "category": "Salary", "amount": "3"},
+        {"date": "2025-02-06", "account": "Main", "category": "Salary", "amount": "2"},
+    ]
+    post = importers.bulk_post_transactions
+
+    def failing(transactions, **kwargs):
+        if any(tx.account.name == "Side" for tx in transactions):
+            raise RuntimeError("boom")
+        return post(transactions, **kwargs)
+
+    # an unexpected error fails the whole chunk
+    monkeypatch.setattr(importers, "bulk_post_transactions", failing)
+    importer = TransactionImporter(u)
+
+    importer.import_stream(iter(rows), chunk_size=2)
+
+    summary = importer.stream_summary()
+    assert summary["chunks"] == {"committed": 3, "failed": 1}
+    assert summary["created"] == 3
+    assert summary["skipped"] == 4
+    assert [e["row"] for e in summary["errors"]] == [3, 4]
+    assert summary["chunk_errors"][0]["rows"] == [5, 6]
+    # the account created inside the failed chunk was rolled back too
+    assert not Account.objects.filter(user=u, name="Side").exists()
+    assert Account.objects.get(user=u, name="Main").balance == Decimal("17.00")
+
+
+@pytest.mark.django_db
+def test_async_import_job_is_processed_by_worker(settings, tmp_path):
+    settings.MEDIA_ROOT = tmp_path / "media"
+    settings.IMPORT_UPLOAD_ROOT = tmp_path / "imports"
+    u = User.objects.create_user("u4", password="pass1234")
+    client = APIClient()
+    client.force_authenticate(u)
+    upload = SimpleUploadedFile(
+        "tx.csv",
+        b"date,account,category,amount\n2025-03-01,Main,Salary,12.00\n",
+    )
+
+    resp = client.post("/api/transactions/import_csv/?mode=async", {"file": upload})
+
+    assert resp.status_code == 202
+    job_id = resp.json()["id"]
+    assert resp.json()["status"] == "pending"
+    # the statement is kept out of the publicly served media directory
+    assert [p.name for p in (tmp_path / "imports").rglob("*.csv")] == ["tx.csv"]
+    assert not (tmp_path / "media").exists()
+    assert not Transaction.objects.filter(user=u).exists()
+
+    call_command("process_import_jobs", "--once", stdout=io.StringIO())
+
+    resp = client.get(f"/api/transactions/import-jobs/{job_id}/")
+    assert resp.status_code == 200
+    assert resp.json()["status"] == "succeeded"
+    assert resp.json()["rows_processed"] == 1
+    assert resp.json()["created"] == 1
+    assert Account.objects.get(user=u, name="Main").balance == Decimal("12.00")
+
+
+@pytest.mark.django_db
+def test_import_worker_fails_stale_and_crashed_jobs(settings, tmp_path, monkeypatch):
+    settings.MEDIA_ROOT = tmp_path / "media"
+    settings.IMPORT_UPLOAD_ROOT = tmp_path / "imports"
+    u = User.objects.create_user("u17", password="pass1234")
+    day_ago = timezone.now() - datetime.timedelta(days=1)
+    stale = ImportJob.objects.create(
+        user=u,
+        file=SimpleUploadedFile("a.csv", b"date,amount\n"),
+        status=ImportJob.STATUS_RUNNING,
+        started_at=day_ago,
+        heartbeat_at=day_ago,
+    )
+    # a long import that still reports progress is left alone
+    busy = ImportJob.objects.create(
+        user=u,
+        status=ImportJob.STATUS_RUNNING,
+        started_at=day_ago,
+        heartbeat_at=timezone.now(),
+    )
+    queued = [
+        ImportJob.objects.create(
+            user=u, file=SimpleUploadedFile(f"{name}.csv", b"date,amount\n")
+        )
+        for name in ("b", "c")
+    ]
+    run = process_import_jobs.run_import_job
+
+    def crash_first(job):
+        if job.pk == queued[0].pk:
+            raise RuntimeError("boom")
+        return run(job)
+
+    monkeypatch.setattr(process_import_jobs, "run_import_job", crash_first)
+    call_command("process_import_jobs", "--once", stdout=io.StringIO())
+
+    statuses = dict(ImportJob.objects.values_list("pk", "status"))
+    assert statuses == {
+        stale.pk: ImportJob.STATUS_FAILED,
+        busy.pk: ImportJob.STATUS_RUNNING,
+        queued[0].pk: ImportJob.STATUS_FAILED,
+        queued[1].pk: ImportJob.STATUS_SUCCEEDED,
+    }
+    assert "boom" in ImportJob.objects.get(pk=queued[0].pk).detail
+    # no statement outlives its job, whatever the outcome
+    assert not list((tmp_path / "imports").rglob("*.csv"))
+    assert set(ImportJob.objects.values_list("file", flat=True)) == {""}
+
+    # a job failed as stale while its worker was still going stays failed
+    job = ImportJob.objects.create(
+        user=u,
+        file=SimpleUploadedFile("d.csv", b"date,account,amount\n2025-03-01,Main,1\n"),
+    )
+    job = importers.claim_next_import_job()
+    ImportJob.objects.filter(pk=job.pk).update(
+        status=ImportJob.STATUS_FAILED, detail="stale"
+    )
+    job = importers.run_import_job(job)
+    assert job.status == ImportJob.STATUS_FAILED
+    assert job.detail == "stale"
+
+
+@pytest.mark.django_db
+def test_reimporting_overlapping_file_skips_duplicates():
+    u = User.objects.create_user("u5", password="pass1234")
+    first = [
+        {"date": "2025-04-01", "account": "Main", "amount": "10", "notes": "Coffee"},
+        {"date": "2025-04-02", "account": "Main", "amount": "20", "notes": "Lunch"},
+    ]
+    second = [
+        # same as an earlier row apart from case and whitespace in the notes
+        {"date": "2025-04-02", "account": "Main", "amount": "20.00", "notes": " lunch"},
+        {"date": "2025-04-03", "account": "Main", "amount": "5", "notes": "Snack"},
+    ]
+    TransactionImporter(u).import_rows(first)
+
+    result = TransactionImporter(u).import_rows(second)
+
+    assert result["created"] == 1
+    assert result["duplicates"] == 1
+    assert Transaction.objects.filter(user=u).count() == 3
+    assert Account.objects.get(user=u, name="Main").balance == Decimal("-35.00")
+    tx = Transaction.objects.get(user=u, notes="Snack")
+    assert tx.fingerprint == tx.compute_fingerprint()
+
+
+def test_date_parser_sniffs_format_and_memoizes():
+    parser = DateParser.sniff(["03/04/2025", "28/04/2025", ""])
+
+    assert parser.format == "%d/%m/%Y"
+    assert parser.parse("03/04/2025") == datetime.date(2025, 4, 3)
+    assert parser.parse("03/04/2025") == datetime.date(2025, 4, 3)
+    assert parser.cache_info().hits == 1
+    # a value in another format is an error, not a different day/month order
+    for value in ("04/13/2025", "2025-04-05", "April 5th"):
+        with pytest.raises(ValueError):
+            parser.parse(value)
+    # a sample that fits day/month and month/day equally is not guessed
+    with pytest.raises(AmbiguousDateFormat) as excinfo:
+        DateParser.sniff(["01/05/2025", "12/11/2025"])
+    assert excinfo.value.formats == ("%d/%m/%Y", "%m/%d/%Y")
+    # without a sniffed format every known one is tried, unpadded ISO too
+    assert DateParser().parse("2025-1-5") == datetime.date(2025, 1, 5)
+    assert DateParser().parse("13/04/2025") == datetime.date(2025, 4, 13)
+
+
+@pytest.mark.django_db
+def test_import_accepts_non_iso_dates():
+    u = User.objects.create_user("u6", password="pass1234")
+    rows = [
+        {"date": "01/13/2025", "account": "Main", "amount": "1"},
+        {"date": "02/01/2025", "account": "Main", "amount": "1"},
+    ]
+
+    result = TransactionImporter(u).import_rows(rows)
+
+    assert result["created"] == 2
+    dates = set(Transaction.objects.filter(user=u).values_list("date", flat=True))
+    assert dates == {datetime.date(2025, 1, 13), datetime.date(2025, 2, 1)}
+
+
+@pytest.mark.django_db
+def test_import_reads_ahead_until_the_date_order_is_known():
+    u = User.objects.create_user("u6b", password="pass1234")
+    # a US statement whose first few hundred rows all fall on days 1-12
+    rows = [
+        {"date": f"{day % 12 + 1:02d}/05/2025", "account": "Main", "amount": "1"}
+        for day in range(300)
+    ]
+    us = rows + [{"date": "05/13/2025", "account": "Main", "amount": "1"}]
+
+    assert TransactionImporter(u).import_rows(us)["created"] == 301
+    dates = set(Transaction.objects.filter(user=u).values_list("date", flat=True))
+    assert datetime.date(2025, 1, 5) in dates
+    assert datetime.date(2025, 5, 13) in dates
+
+    # with nothing to tell the orders apart the file is refused
+    client = APIClient()
+    client.force_authenticate(u)
+    csv_data = "date,account,amount\n" + "".join(
+        f"{row['date']},Main,1\n" for row in rows
+    )
+    for mode in ("atomic", "stream"):
+        upload = SimpleUploadedFile("tx.csv", csv_data.encode("utf-8"))
+        resp = client.post(
+            f"/api/transactions/import_csv/?mode={mode}", {"file": upload}
+        )
+        assert resp.status_code == 400
+        assert "%m/%d/%Y" in resp.data["detail"]
+    assert Transaction.objects.filter(user=u).count() == 301
+
+
+@pytest.mark.django_db
+def test_export_csv_streams_rows_in_date_order():
+    u = User.objects.create_user("u7", password="pass1234")
+    acc = Account.objects.create(user=u, name="Main", account_type="bank")
+    cat = Category.objects.create(user=u, name="Books", type="expense")
+    Transaction.objects.create(
+        user=u, account=acc, category=cat, amount=Decimal("3.00"), date="2025-05-02"
+    )
+    Transaction.objects.create(
+        user=u, account=acc, amount=Decimal("7.00"), date="2025-05-01", notes="x"
+    )
+    client = APIClient()
+    client.force_authenticate(u)
+
+    resp = client.get("/api/transactions/export_csv/")
+
+    assert resp.status_code == 200
+    assert resp.streaming
+    body = b"".join(resp.streaming_content).decode("utf-8")
+    assert body.splitlines() == [
+        "date,account,category,category_type,amount,notes",
+        "2025-05-01,Main,N/A,,7.00,x",
+        "2025-05-02,Main,Books,expense,3.00,",
+    ]
+
+
+@pytest.mark.django_db
+def test_export_csv_filters_since_cursor_and_gzip():
+    u = User.objects.create_user("u8", password="pass1234")
+    main = Account.objects.create(user=u, name="Main", account_type="bank")
+    side = Account.objects.create(user=u, name="Side", account_type="cash")
+    Transaction.objects.create(user=u, account=main, amount=1, date="2025-06-01")
+    Transaction.objects.create(user=u, account=main, amount=2, date="2025-06-20")
+    Transaction.objects.create(user=u, account=side, amount=3, date="2025-06-21")
+    client = APIClient()
+    client.force_authenticate(u)
+
+    resp = client.get(
+        "/api/transactions/export_csv/",
+        {"account": main.pk, "start_date": "2025-06-10", "compress": "gzip"},
+    )
+
+    assert resp["Content-Type"] == "application/gzip"
+    body = gzip.decompress(b"".join(resp.streaming_content)).decode("utf-8")
+    assert [line.split(",")[0] for line in body.splitlines()] == [
+        "date",
+        "2025-06-20",
+    ]
+
+    cursor = resp["X-Export-Cursor"]
+    # rows last written well before the export are not sent again
+    Transaction.objects.update(updated_at=timezone.now() - datetime.timedelta(hours=1))
+    Transaction.objects.create(user=u, account=side, amount=4, date="2025-01-01")
+    # stamped a little before the export but committed after it
+    Transaction.objects.filter(amount=3).update(
+        updated_at=timezone.now() - datetime.timedelta(minutes=1)
+    )
+    resp = client.get("/api/transactions/export_csv/", {"since": cursor})
+    body = b"".join(resp.streaming_content).decode("utf-8")
+    assert body.splitlines()[1:] == [
+        "2025-01-01,Side,N/A,,4.00,",
+        "2025-06-21,Side,N/A,,3.00,",
+    ]
+
+    resp = client.get("/api/transactions/export_csv/", {"start_date": "June"})
+    assert resp.status_code == 400
+
+
+@pytest.mark.django_db
+def test_reconcile_balances_reports_and_fixes_drift():
+    u = User.objects.create_user("u9", password="pass1234")
+    acc = Account.objects.create(
+        user=u, name="A1", account_type="bank", balance=Decimal("100.00")
+    )
+    cat = Category.objects.create(user=u, name="Refunds", type="expense")
+    Transaction.objects.create(user=u, account=acc, category=cat, amount=25)
+    # bypasses the signals, so the stored balance is now stale
+    Category.objects.filter(pk=cat.pk).update(type="income")
+
+    out = io.StringIO()
+    call_command("reconcile_balances", stdout=out)
+    acc.refresh_from_db()
+    assert acc.balance == Decimal("75.00")
+    assert "expected 125.00" in out.getvalue()
+
+    call_command("reconcile_balances", "--fix", stdout=io.StringIO())
+    acc.refresh_from_db()
+    assert acc.balance == Decimal("125.00")
+    assert list(reconcile_balances(Account.objects.filter(user=u))) == []
+
+
+@pytest.mark.django_db
+def test_transaction_edit_diffs_from_loaded_state(django_assert_num_queries):
+    u = User.objects.create_user("u10", password="pass1234")
+    a1 = Account.objects.create(user=u, name="A1", account_type="bank")
+    a2 = Account.objects.create(user=u, name="A2", account_type="bank")
+    food = Category.objects.create(user=u, name="Food", type="expense")
+    pay = Category.objects.create(user=u, name="Pay", type="income")
+    tx = Transaction.objects.create(user=u, account=a1, category=food, amount=10)
+    tx = Transaction.objects.select_related("category").get(pk=tx.pk)
+
+    tx.amount = Decimal("15.00")
+    # UPDATEs for the row and the balance, no extra SELECT of the old row;
+    # the others keep that day's balance snapshot, the month's rollup and
+    # the user's data version current
+    with django_assert_num_queries(6):
+        tx.save()
+
+    tx.account = a2
+    tx.category = pay
+    tx.save()
+    a1.refresh_from_db()
+    a2.refresh_from_db()
+    assert a1.balance == Decimal("0.00")
+    assert a2.balance == Decimal("15.00")
+
+
+@pytest.mark.django_db
+def test_process_recurring_catches_up_in_batches():
+    u = User.objects.create_user("u11", password="pass1234")
+    acc = Account.objects.create(
+        user=u, name="A1", account_type="bank", balance=Decimal("500.00")
+    )
+    rent = Category.objects.create(user=u, name="Rent", type="expense")
+    pay = Category.objects.create(user=u, name="Pay", type="income")
+    monthly = RecurringTransaction.objects.create(
+        user=u,
+        account=acc,
+        category=rent,
+        amount=Decimal("100.00"),
+        start_date=datetime.date(2025, 1, 31),
+        next_date=datetime.date(2025, 1, 31),
+        frequency="monthly",
+    )
+    weekly = RecurringTransaction.objects.create(
+        user=u,
+        account=acc,
+        category=pay,
+        amount=Decimal("10.00"),
+        start_date=datetime.date(2025, 3, 20),
+        next_date=datetime.date(2025, 3, 20),
+        frequency="weekly",
+    )
+    RecurringTransaction.objects.create(
+        user=u,
+        account=acc,
+        amount=Decimal("1.00"),
+        start_date=datetime.date(2025, 5, 1),
+        next_date=datetime.date(2025, 5, 1),
+        frequency="daily",
+    )
+
+    today = datetime.date(2025, 4, 5)
+    assert process_recurring(today=today, batch_size=1) == (2, 6)
+    dates = sorted(
+        Transaction.objects.filter(user=u).values_list("category__name", "date")
+    )
+    assert dates == [
+        ("Pay", datetime.date(2025, 3, 20)),
+        ("Pay", datetime.date(2025, 3, 27)),
+        ("Pay", datetime.date(2025, 4, 3)),
+        ("Rent", datetime.date(2025, 1, 31)),
+        ("Rent", datetime.date(2025, 2, 28)),
+        ("Rent", datetime.date(2025, 3, 28)),
+    ]
+    monthly.refresh_from_db()
+    weekly.refresh_from_db()
+    assert monthly.next_date == datetime.date(2025, 4, 28)
+    assert weekly.next_date == datetime.date(2025, 4, 10)
+    acc.refresh_from_db()
+    assert acc.balance == Decimal("230.00")
+
+    # snapshots and rollups match a full rebuild
+    snapshots = list(AccountBalanceSnapshot.objects.values_list("date", "balance"))
+    rollups = list(MonthlyCategoryTotal.objects.values_list("month", "total"))
+    rebuild_snapshots([acc.pk])
+    rebuild_monthly_totals([u.pk])
+    assert list(AccountBalanceSnapshot.objects.values_list("date", "balance")) == (
+        snapshots
+    )
+    assert sorted(MonthlyCategoryTotal.objects.values_list("month", "total")) == (
+        sorted(rollups)
+    )
+
+    # already caught up: nothing more is posted
+    assert process_recurring(today=today) == (0, 0)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_process_recurring_claims_rules_once_across_runs():
+    today = datetime.date(2025, 4, 5)
+    rules = []
+    for name in ("u12", "u13", "u14"):
+        u = User.objects.create_user(name, password="pass1234")
+        acc = Account.objects.create(user=u, name="A1", account_type="bank")
+        rules.append(
+            RecurringTransaction.objects.create(
+                user=u,
+                account=acc,
+                amount=Decimal("1.00"),
+                start_date=datetime.date(2025, 4, 1),
+                next_date=datetime.date(2025, 4, 1),
+                frequency="daily",
+            )
+        )
+
+    # another run holding a claim on the first rule: this run skips it
+    locked, release = threading.Event(), threading.Event()
+
+    def hold_claim():
+        try:
+            with transaction.atomic():
+                RecurringTransaction.objects.select_for_update().get(pk=rules[0].pk)
+                locked.set()
+                release.wait(5)
+        finally:
+            connections.close_all()
+
+    holder = threading.Thread(target=hold_claim)
+    holder.start()
+    locked.wait(5)
+    try:
+        assert process_recurring(today=today, shard=0, shards=1) == (2, 10)
+    finally:
+        release.set()
+        holder.join()
+
+    out = io.StringIO()
+    call_command("process_recurring", "--workers", "2", stdout=out)
+    assert Transaction.objects.filter(date__lte=today).count() == 15
+    for rule in rules:
+        assert (
+            Transaction.objects.filter(
+                account_id=rule.account_id, date=datetime.date(2025, 4, 1)
+            ).count()
+            == 1
+        )
+
+
+@pytest.mark.django_db
+def test_scheduler_sleeps_until_next_due_date_and_sees_new_rules():
+    u = User.objects.create_user("u15", password="pass1234")
+    acc = Account.objects.create(user=u, name="A1", account_type="bank")
+    today = timezone.localdate()
+    rule = RecurringTransaction.objects.create(
+        user=u,
+        account=acc,
+        amount=Decimal("1.00"),
+        start_date=today - datetime.timedelta(days=1),
+        next_date=today - datetime.timedelta(days=1),
+        frequency="daily",
+    )
+    scheduler = RecurringScheduler(poll_interval=10**6)
+
+    assert scheduler.step() == 0
+    assert Transaction.objects.filter(account=acc).count() == 2
+    # the advanced rule is picked up by the poll; nothing due until midnight
+    wait = scheduler.step()
+    assert 0 < wait <= 86400
+    assert scheduler.heap == [today + datetime.timedelta(days=1)]
+    rule.refresh_from_db()
+    assert rule.next_date == today + datetime.timedelta(days=1)
+
+    # a rule created due today is posted on the next iteration
+    RecurringTransaction.objects.create(
+        user=u,
+        account=acc,
+        amount=Decimal("2.00"),
+        start_date=today,
+        next_date=today,
+        frequency="monthly",
+    )
+    assert scheduler.step() == 0
+    assert Transaction.objects.filter(account=acc).count() == 3
+    assert not scheduler.refresh() or scheduler.heap[0] > today
+
+    # a rule stamped before the newest one seen but committed after that
+    # poll is still queued, as long as it lands within the commit margin
+    later = today + datetime.timedelta(days=5)
+    late = RecurringTransaction.objects.create(
+        user=u,
+        account=acc,
+        amount=Decimal("4.00"),
+        start_date=later,
+        next_date=later,
+        frequency="monthly",
+    )
+    RecurringTransaction.objects.filter(pk=late.pk).update(
+        updated_at=scheduler.version - datetime.timedelta(minutes=1)
+    )
+    assert scheduler.refresh()
+    assert later in scheduler.heap
+    assert not scheduler.refresh()
+
+
+def test_scheduler_survives_database_errors(monkeypatch):
+    scheduler = RecurringScheduler(poll_interval=30)
+    steps, sleeps = [], []
+
+    def step():
+        steps.append(1)
+        if len(steps) == 1:
+            raise OperationalError("server closed the connection")
+        return 5
+
+    class Stop(Exception):
+        pass
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        if len(sleeps) == 2:
+            raise Stop
+
+    monkeypatch.setattr(scheduler, "step", step)
+    monkeypatch.setattr(scheduler_module.time, "sleep", sleep)
+    # no database access here; earlier tests may leave a connection around
+    monkeypatch.setattr(scheduler_module, "close_old_connections", lambda: None)
+    with pytest.raises(Stop):
+        scheduler.run_forever()
+    assert sleeps == [30, 5]
@@ -0,0 +1,104 @@
+# backend/finance/trends.py
+import datetime
+from decimal import Decimal
+from django.db.models import Q, Sum
+from django.db.models.functions import TruncDay, TruncWeek
+from .models import Category, MonthlyCategoryTotal, Transaction
+from .rollups import month_start, next_month
+
+ZERO = Decimal("0.00")
+GRANULARITIES = ("month", "week", "day")
+# most buckets served in one response
+MAX_BUCKETS = 1000
+
+_INCOME = Q(category__type=Category.TYPE_INCOME)
+_EXPENSE = Q(category__type=Category.TYPE_EXPENSE)
+
+
+def bucket_start(date, granularity):
+    """Start of the bucket containing `date`; weeks start on Monday."""
+    if granularity == "month":
+        return month_start(date)
+    if granularity == "week":
+        return date - datetime.timedelta(days=date.weekday())
+    return date
+
+
+def next_bucket(start, granularity):
+    if granularity == "month":
+        return next_month(start)
+    return start + datetime.timedelta(days=7 if granularity == "week" else 1)
+
+
+def bucket_count(start, end, granularity):
+    """Number of buckets overlapping [start, end], without listing them."""
+    first, last = bucket_start(start, granularity), bucket_start(end, granularity)
+    if granularity == "month":
+        return max(0, (last.year - first.year) * 12 + last.month - first.month + 1)
+    step = 7 if granularity == "week" else 1
+    return max(0, (last - first).days // step + 1)
+
+
+def bucket_starts(start, end, granularity):
+    """Start of every bucket overlapping [start, end]."""
+    count = bucket_count(start, end, granularity)
+    if not count:
+        return []
+    starts = [bucket_start(start, granularity)]
+    while len(starts) < count:
+        # never step past the last bucket, which may be the last date there is
+        starts.append(next_bucket(starts[-1], granularity))
+    return starts
+
+
+def _grouped_totals(user, start, end, granularity):
+    """{bucket start: (income, expense)} for buckets with any rows."""
+    if granularity == "month":
+        # months are already rolled up; expense totals are stored negative
+        rows = (
+            MonthlyCategoryTotal.objects.filter(
+                user=user, month__range=(month_start(start), end)
+            )
+            .values("month")
+            .annotate(
+                income=Sum("total", filter=_INCOME, default=ZERO),
+                expense=-Sum("total", filter=_EXPENSE, default=ZERO),
+            )
+            .values_list("month", "income", "expense")
+            .order_by()
+        )
+    else:
+        trunc = TruncWeek if granularity == "week" else TruncDay
+        rows = (
+            Transaction.objects.filter(user=user, date__range=(start, end))
+            .annotate(bucket=trunc("date"))
+            .values("bucket")
+            .annotate(
+                income=Sum("amount", filter=_INCOME, default=ZERO),
+                expense=Sum("amount", filter=_EXPENSE, default=ZERO),
+            )
+            .values_list("bucket", "income", "expense")
+            .order_by()
+        )
+    return {bucket: (income, expense) for bucket, income, expense in rows}
+
+
+def cash_flow_trend(user, start, end, granularity="month"):
+    """
+    Income, expense and net of `user` per month, week or day between
+    `start` and `end`, from one grouped query; buckets without
+    transactions are filled with zeros.
+    """
+    totals = _grouped_totals(user, start, end, granularity)
+    series = []
+    for bucket in bucket_starts(start, end, granularity):
+        income, expense = totals.get(bucket, (ZERO, ZERO))
+        series.append(
+            {
+                "start": bucket,
+                "income": income,
+                "expense": expense,
+                "net": income - expense,
+            }
+        )
+    return series
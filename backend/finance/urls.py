@@ -6,6 +6,7 @@ from .views import (
     TransactionViewSet,
     BudgetViewSet,
     RecurringTransactionViewSet,
+    BackupView,
 )
 
 # Import the new analytics views
@@ -14,6 +15,10 @@ from .analytics_views import (
     SpendingByCategoryAnalyticsView,
     BudgetProgressView,
     RecentTransactionsView,
+    BalanceHistoryView,
+    TrendAnalyticsView,
+    DashboardAnalyticsView,
+    ForecastAnalyticsView,
 )
 
 router = DefaultRouter()
@@ -29,6 +34,7 @@ router.register(
 
 urlpatterns = [
     path("", include(router.urls)),
+    path("backup/", BackupView.as_view(), name="backup"),
     path(
         "categories/mine/",
         CategoryViewSet.as_view({"get": "mine"}),
@@ -64,4 +70,20 @@ urlpatterns = [
         RecentTransactionsView.as_view(),
         name="recent-transactions",
     ),
+    path(
+        "analytics/balance-history/",
+        BalanceHistoryView.as_view(),
+        name="analytics-balance-history",
+    ),
+    path("analytics/trend/", TrendAnalyticsView.as_view(), name="analytics-trend"),
+    path(
+        "analytics/forecast/",
+        ForecastAnalyticsView.as_view(),
+        name="analytics-forecast",
+    ),
+    path(
+        "analytics/dashboard/",
+        DashboardAnalyticsView.as_view(),
+        name="analytics-dashboard",
+    ),
 ]
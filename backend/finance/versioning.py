@@ -0,0 +1,86 @@
+# backend/finance/versioning.py
+from django.db.models import F
+from django.utils import timezone
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.response import Response
+from .models import DataVersion
+
+
+def bump_data_version(user_id=None):
+    """
+    Mark a user's finance data (every user's when None, e.g. for shared
+    categories) as changed. A plain UPDATE: a user without a row yet has
+    never been handed an ETag, and the row is created on the next read.
+    """
+    versions = DataVersion.objects.all()
+    if user_id is not None:
+        versions = versions.filter(user_id=user_id)
+    versions.update(version=F("version") + 1)
+
+
+def bump_data_versions(user_ids):
+    """bump_data_version for several users in one UPDATE."""
+    DataVersion.objects.filter(user_id__in=list(user_ids)).update(
+        version=F("version") + 1
+    )
+
+
+def data_version(user):
+    version, _ = DataVersion.objects.get_or_create(user=user)
+    return version.version
+
+
+class NotModified(APIException):
+    status_code = status.HTTP_304_NOT_MODIFIED
+
+
+class DataVersionETagMixin:
+    """
+    Conditional GET for views whose response depends only on the user's
+    finance data and the request URL: responses carry a weak ETag derived
+    from the user's data version, and a matching If-None-Match is answered
+    with 304 right after authentication, before any query or serializer
+    of the view runs. On viewsets only `etag_actions` take part.
+    """
+
+    etag_actions = ("list", "retrieve", "mine")
+
+    def _etag_applies(self, request):
+        if request.method not in ("GET", "HEAD"):
+            return False
+        action = getattr(self, "action", None)
+        return action is None or action in self.etag_actions
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.etag = self.data_version = None
+        if not self._etag_applies(request):
+            return
+        self.data_version = data_version(request.user)
+        # the date is part of it since default ranges (this month, the
+        # last year) move with it
+        self.etag = 'W/"{}.{}.{:%Y%m%d}"'.format(
+            request.user.pk, self.data_version, timezone.localdate()
+        )
+        if_none_match = request.headers.get("If-None-Match")
+        if if_none_match:
+            tags = parse_etags(if_none_match)
+            if "*" in tags or self.etag.removeprefix("W/") in {
+                tag.removeprefix("W/") for tag in tags
+            }:
+                raise NotModified()
+
+    def handle_exception(self, exc):
+        if isinstance(exc, NotModified):
+            return Response(status=status.HTTP_304_NOT_MODIFIED)
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        etag = getattr(self, "etag", None)
+        if etag and response.status_code in (200, 304):
+            response["ETag"] = etag
+            response["Cache-Control"] = "private, no-cache"
+        return response
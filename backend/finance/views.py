@@ -1,53 +1,64 @@
 import csv
-import io
 import logging
-import random
-from decimal import Decimal
 from django.utils import timezone
-from datetime import datetime
-from django.http import HttpResponse
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404
 from rest_framework.decorators import action
 from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.response import Response
 from rest_framework import viewsets, permissions, status
 from rest_framework.generics import GenericAPIView
+from rest_framework.views import APIView
+from django.db import transaction
 from django.db.models import Q
-from .models import Account, Category, Transaction, Budget, RecurringTransaction
+from .models import (
+    Account,
+    Category,
+    Transaction,
+    Budget,
+    RecurringTransaction,
+    ImportJob,
+)
 from .serializers import (
     AccountSerializer,
     CategorySerializer,
     TransactionSerializer,
     BudgetSerializer,
     RecurringTransactionSerializer,
+    ImportJobSerializer,
 )
+from .pagination import KeysetPagination, TransactionPagination
 from .permissions import IsOwner
-
-
-DATE_FORMATS = ("%Y-%m-%d", "%d-%m-%Y", "%d/%m/%Y", "%m/%d/%Y")
+from .versioning import DataVersionETagMixin
+from .backup import RestoreError, iter_archive_lines, read_archive
+from .exporters import (
+    export_cursor,
+    export_rows,
+    filter_export_queryset,
+    gzip_stream,
+    stream_csv,
+)
+from .recurring import (
+    RECURRING_INLINE_LIMIT,
+    due_occurrences,
+    post_due_occurrences,
+)
+from .dateparse import AmbiguousDateFormat
+from .importers import STREAM_MAX_ERRORS, TransactionImporter, iter_csv_rows
 
 logger = logging.getLogger(__name__)
 
 
-def generate_random_color():
-    """Generates a random, visually appealing hex color."""
-    return f"#{random.randint(0, 0xFFFFFF): 06x}"
-
-
-def parse_date(s):
-    s = s.strip()
-    for fmt in DATE_FORMATS:
-        try:
-            return datetime.strptime(s, fmt).date()
-        except Exception:
-            continue
-    return None
-
-
 class OwnerMixin(GenericAPIView):
     """
-    mixin to filter by request.user and set owner on create
+    mixin to filter by request.user and set owner on create;
+    lists are keyset-paginated on request (see KeysetPagination),
+    transactions always
     """
 
+    pagination_class = KeysetPagination
+    keyset_ordering = ("-id",)
+
     def get_queryset(self):
         qs = super().get_queryset()
         return qs.filter(user=self.request.user)
@@ -56,13 +67,15 @@ class OwnerMixin(GenericAPIView):
         serializer.save(user=self.request.user)
 
 
-class AccountViewSet(OwnerMixin, viewsets.ModelViewSet):
+class AccountViewSet(DataVersionETagMixin, OwnerMixin, viewsets.ModelViewSet):
     serializer_class = AccountSerializer
     permission_classes = [permissions.IsAuthenticated, IsOwner]
     queryset = Account.objects.all()
+    # not updated_at: an edit would move the account between pages
+    keyset_ordering = ("-created_at", "-id")
 
 
-class CategoryViewSet(viewsets.ModelViewSet):
+class CategoryViewSet(DataVersionETagMixin, viewsets.ModelViewSet):
     serializer_class = CategorySerializer
     permission_classes = [permissions.IsAuthenticated]
 
@@ -85,126 +98,104 @@ class CategoryViewSet(viewsets.ModelViewSet):
         serializer.save(user=self.request.user)
 
 
-class TransactionViewSet(OwnerMixin, viewsets.ModelViewSet):
+class TransactionViewSet(DataVersionETagMixin, OwnerMixin, viewsets.ModelViewSet):
     serializer_class = TransactionSerializer
     permission_classes = [permissions.IsAuthenticated, IsOwner]
     queryset = Transaction.objects.select_related("account", "category").all()
+    pagination_class = TransactionPagination
+    keyset_ordering = ("-date", "-created_at", "-id")
 
     @action(
         detail=False, methods=["post"], parser_classes=[MultiPartParser, FormParser]
     )
     def import_csv(self, request, *args, **kwargs):
-        # ... (logging and file handling remain the same)
-        user = request.user
-        created_count = 0
-        skipped_count = 0
-        errors = []
+        """
+        Import transactions from an uploaded CSV file.
+        `?mode=stream` commits the file in independent chunks and reports
+        how many of them succeeded; the default commits all rows or none.
+        `?mode=async` stores the file, queues an ImportJob for the
+        `process_import_jobs` worker and answers 202 straight away.
+        """
+        upload = request.FILES.get("file")
+        if upload is None:
+            return Response(
+                {"detail": "Error processing file: no file was uploaded."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
 
+        mode = request.query_params.get("mode", "atomic")
+        if mode == "async":
+            job = ImportJob.objects.create(user=request.user, file=upload)
+            return Response(
+                ImportJobSerializer(job).data, status=status.HTTP_202_ACCEPTED
+            )
         try:
-            decoded_file = request.FILES.get("file").read().decode("utf-8")
-            io_string = io.StringIO(decoded_file)
-            reader = csv.DictReader(io_string)
-            rows = list(reader)
-        except Exception as e:
+            if mode == "stream":
+                importer = TransactionImporter(
+                    request.user, max_errors=STREAM_MAX_ERRORS
+                )
+                importer.import_stream(iter_csv_rows(upload))
+                result = importer.stream_summary()
+            else:
+                importer = TransactionImporter(request.user)
+                result = importer.import_rows(iter_csv_rows(upload))
+        except (UnicodeDecodeError, csv.Error, AmbiguousDateFormat) as e:
             return Response(
                 {"detail": f"Error processing file: {e}"},
                 status=status.HTTP_400_BAD_REQUEST,
             )
+        return Response(result, status=status.HTTP_200_OK)
 
-        for i, row in enumerate(rows, 1):
-            try:
-                row_cleaned = {k.lower().strip(): v for k, v in row.items()}
-                account_name = row_cleaned.get("account", "Imported Account")
-                category_name = row_cleaned.get("category", "Uncategorized")
-                # --- THIS IS THE NEW LOGIC ---
-                # 1. Look for the 'category_type' column in the CSV. Default to 'expense'.
-                category_type = row_cleaned.get("category_type", "expense").lower()
-                if category_type not in ["income", "expense"]:
-                    category_type = "expense"  # Sanitize the input
-
-                account, _ = Account.objects.get_or_create(
-                    name=account_name, user=user, defaults={"account_type": "bank"}
-                )
-
-                category = (
-                    Category.objects.filter(
-                        Q(name__iexact=category_name)
-                        & (Q(user=user) | Q(user__isnull=True))
-                    )
-                    .order_by("user_id")
-                    .first()
-                )
-
-                if not category:
-                    # 2. When creating a new category, use the type from the CSV.
-                    category = Category.objects.create(
-                        name=category_name,
-                        user=user,
-                        type=category_type,
-                        color=generate_random_color(),
-                    )
-
-                Transaction.objects.create(
-                    user=user,
-                    account=account,
-                    category=category,
-                    amount=Decimal(
-                        row_cleaned.get("amount", "0").replace("$", "").replace(",", "")
-                    ),
-                    date=datetime.strptime(row_cleaned.get("date"), "%Y-%m-%d").date(),
-                    notes=row_cleaned.get("notes", ""),
-                )
-                created_count += 1
-            except Exception as e:
-                error_detail = (
-                    f"Row {i} skipped due to a data error: {e}. Row data: {row}"
-                )
-                logger.warning(error_detail)
-                errors.append({"row": i, "data": row, "error": str(e)})
-                skipped_count += 1
-
-        return Response(
-            {"created": created_count, "skipped": skipped_count, "errors": errors},
-            status=status.HTTP_200_OK,
-        )
+    @action(
+        detail=False,
+        methods=["get"],
+        url_path=r"import-jobs/(?P<job_id>\d+)",
+        url_name="import-job",
+    )
+    def import_job(self, request, job_id=None, *args, **kwargs):
+        """Status and progress of a background import started with mode=async."""
+        job = get_object_or_404(ImportJob, pk=job_id, user=request.user)
+        return Response(ImportJobSerializer(job).data)
 
     @action(detail=False, methods=["get"])
     def export_csv(self, request, *args, **kwargs):
-        response = HttpResponse(content_type="text/csv")
-        response["Content-Disposition"] = 'attachment; filename="transactions.csv"'
-        writer = csv.writer(response)
-
-        # 3. Add the new 'category_type' column to the header.
-        writer.writerow(
-            ["date", "account", "category", "category_type", "amount", "notes"]
-        )
-
-        transactions = self.get_queryset().order_by("date")
-        for tx in transactions:
-            # 4. Add the category type to each row.
-            category_name = tx.category.name if tx.category else "N/A"
-            category_type = tx.category.type if tx.category else ""
-            writer.writerow(
-                [
-                    tx.date,
-                    tx.account.name,
-                    category_name,
-                    category_type,
-                    tx.amount,
-                    tx.notes,
-                ]
-            )
-
+        """
+        Stream the user's transactions as CSV, oldest first.
+        Accepts the filters of `filter_export_queryset` and
+        `?compress=gzip`. The `X-Export-Cursor` header holds the value to
+        pass as `since` next time to get only what changed in between (see
+        `export_cursor`). Deleted transactions are not reported by a delta
+        export; a full export is needed to drop them.
+        """
+        cursor = export_cursor()
+        try:
+            queryset = filter_export_queryset(self.get_queryset(), request.query_params)
+        except ValueError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        content = stream_csv(export_rows(queryset))
+        filename = "transactions.csv"
+        if request.query_params.get("compress") == "gzip":
+            content = gzip_stream(content)
+            filename += ".gz"
+            response = StreamingHttpResponse(content, content_type="application/gzip")
+        else:
+            response = StreamingHttpResponse(content, content_type="text/csv")
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        response["X-Export-Cursor"] = cursor
         return response
 
 
-class BudgetViewSet(OwnerMixin, viewsets.ModelViewSet):
+class BudgetViewSet(DataVersionETagMixin, OwnerMixin, viewsets.ModelViewSet):
     serializer_class = BudgetSerializer
     permission_classes = [permissions.IsAuthenticated, IsOwner]
     queryset = Budget.objects.all()
+    keyset_ordering = ("-start_date", "-id")
 
 
-class RecurringTransactionViewSet(OwnerMixin, viewsets.ModelViewSet):
+class RecurringTransactionViewSet(
+    DataVersionETagMixin, OwnerMixin, viewsets.ModelViewSet
+):
     """
     API endpoint for recurring transactions.
     """
@@ -213,32 +204,57 @@ class RecurringTransactionViewSet(OwnerMixin, viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated, IsOwner]
     queryset = RecurringTransaction.objects.all()
 
+    def create(self, request, *args, **kwargs):
+        response = super().create(request, *args, **kwargs)
+        response.data["posted_occurrences"] = self.posted_occurrences
+        response.data["pending_occurrences"] = self.pending_occurrences
+        return response
+
     def perform_create(self, serializer):
         """
-        Overrides the default create behavior. After saving a new recurring
-        transaction, it immediately checks if the first transaction is due.
+        Save the rule and catch up the occurrences already due: up to
+        RECURRING_INLINE_LIMIT of them are posted here in one bulk insert,
+        a longer backlog is left to the scheduler (or process_recurring),
+        which claims the rule like any other due one.
         """
-        # First, save the new recurring transaction instance
-        # The serializer's `create` method will set the initial `next_date`
-        recurring_instance = serializer.save(user=self.request.user)
-
-        # Now, check if the first transaction should be created immediately
         today = timezone.localdate()
-        if recurring_instance.next_date <= today:
-            while True:
-
-                # Create the first transaction
-                Transaction.objects.create(
-                    user=recurring_instance.user,
-                    account=recurring_instance.account,
-                    category=recurring_instance.category,
-                    amount=recurring_instance.amount,
-                    date=recurring_instance.next_date,
-                    notes=f"Recurring: {recurring_instance.notes or recurring_instance.category}",
-                )
-                # Advance the date for the next cycle
-                recurring_instance.advance_next_date()
-                if recurring_instance.next_date > today:
-                    break
-                else:
-                    continue
+        with transaction.atomic():
+            rule = serializer.save(user=self.request.user)
+            occurrences, _ = due_occurrences([rule], today)
+            if len(occurrences) <= RECURRING_INLINE_LIMIT:
+                self.posted_occurrences = post_due_occurrences([rule], today)
+                self.pending_occurrences = 0
+            else:
+                self.posted_occurrences = 0
+                self.pending_occurrences = len(occurrences)
+
+
+class BackupView(APIView):
+    """
+    GET downloads a compressed archive of all the user's finance data.
+    POST restores one (multipart `file`); pass `replace=true` to overwrite
+    existing data.
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+    parser_classes = [MultiPartParser, FormParser]
+
+    def get(self, request, *args, **kwargs):
+        content = gzip_stream(iter_archive_lines(request.user))
+        response = StreamingHttpResponse(content, content_type="application/gzip")
+        response["Content-Disposition"] = 'attachment; filename="quanta-backup.gz"'
+        return response
+
+    def post(self, request, *args, **kwargs):
+        upload = request.FILES.get("file")
+        if upload is None:
+            return Response(
+                {"detail": "No archive was uploaded."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        replace = str(request.data.get("replace", "")).lower() in ("1", "true")
+        try:
+            counts = read_archive(request.user, upload, replace=replace)
+        except RestoreError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({"restored": counts}, status=status.HTTP_201_CREATED)
@@ -4,9 +4,5 @@ set -e
 
 echo "Starting scheduler..."
 
-while true; do
-  python manage.py process_recurring
-
-  echo "Recurring transactions processed. Waiting 24 hours..."
-  sleep 86400
-done
\ No newline at end of file
+# sleeps until the next recurring rule is due; see finance/scheduler.py
+exec python manage.py run_scheduler
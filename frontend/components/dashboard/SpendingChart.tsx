@@ -10,9 +10,12 @@ const chartConfig = {
 
 };
 
+// legend styling for the pie; the API only sends the data
+const legendStyle = { legendFontColor: '#7F7F7F', legendFontSize: 12 };
+
 export default function SpendingChart({ data }) {
   const navigation = useNavigation();
-  const topSpendingData = data.slice(0, 5);
+  const topSpendingData = data.slice(0, 5).map((item) => ({ ...item, ...legendStyle }));
   return (
     <View style={styles.card}>
       <View style={styles.headerRow}>
@@ -1,4 +1,4 @@
-import { useQuery, useMutation, useQueryClient, QueryKey } from '@tanstack/react-query';
+import { useQuery, useInfiniteQuery, useMutation, useQueryClient, QueryKey } from '@tanstack/react-query';
 import client from '../api/client';
 
 // ====================================================================================
@@ -30,6 +30,11 @@ export type Transaction = {
     account_details?: Account;
 };
 
+export type Page<T> = {
+    next: string | null;
+    results: T[];
+};
+
 export type Budget = {
     id: number;
     category: number;
@@ -236,10 +241,14 @@ export const useDeleteCategory = () =>
 
 // --- Transactions ---
 
+// The transactions list is keyset-paginated; each page links to the next.
 export const useAllTransactions = () =>
-    useQuery<Transaction[]>({
+    useInfiniteQuery<Page<Transaction>, Error, Transaction[], QueryKey, string>({
         queryKey: queryKeys.transactions,
-        queryFn: () => client.get('/transactions/').then((res) => res.data),
+        queryFn: ({ pageParam }) => client.get(pageParam).then((res) => res.data),
+        initialPageParam: '/transactions/',
+        getNextPageParam: (lastPage) => lastPage.next ?? undefined,
+        select: (data) => data.pages.flatMap((page) => page.results),
     });
 
 export const useCreateTransaction = () =>
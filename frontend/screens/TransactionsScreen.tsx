@@ -25,13 +25,28 @@ const TransactionItem = ({ item }) => {
 
 export default function TransactionsScreen() {
     const navigation = useNavigation();
-    const { data: transactions, isLoading, isError, isFetching, refetch } = useAllTransactions();
+    const {
+        data: transactions,
+        isLoading,
+        isError,
+        isFetching,
+        refetch,
+        fetchNextPage,
+        hasNextPage,
+        isFetchingNextPage,
+    } = useAllTransactions();
     const { isFabVisible, handleScroll } = useFabVisibility();
 
     const onRefresh = useCallback(() => {
         refetch();
     }, [refetch]);
 
+    const onEndReached = useCallback(() => {
+        if (hasNextPage && !isFetchingNextPage) {
+            fetchNextPage();
+        }
+    }, [hasNextPage, isFetchingNextPage, fetchNextPage]);
+
     if (isLoading) {
         return <ActivityIndicator animating={true} style={styles.loader} />;
     }
@@ -48,7 +63,10 @@ export default function TransactionsScreen() {
                 renderItem={({ item }) => <TransactionItem item={item} />}
                 ListEmptyComponent={<Text style={styles.emptyText}>No transactions recorded yet.</Text>}
                 onRefresh={onRefresh}
-                refreshing={isFetching}
+                refreshing={isFetching && !isFetchingNextPage}
+                onEndReached={onEndReached}
+                onEndReachedThreshold={0.5}
+                ListFooterComponent={isFetchingNextPage ? <ActivityIndicator style={styles.footerLoader} /> : null}
                 onScroll={handleScroll}
                 scrollEventThrottle={16}
             />
@@ -65,6 +83,7 @@ export default function TransactionsScreen() {
 const styles = StyleSheet.create({
     container: { flex: 1, backgroundColor: '#f5f5f5' },
     loader: { flex: 1, justifyContent: 'center', alignItems: 'center' },
+    footerLoader: { marginVertical: 16 },
     item: { backgroundColor: 'white', borderBottomWidth: 1, borderBottomColor: '#e0e0e0', paddingLeft: 20 },
     amountPositive: { alignSelf: 'center', fontSize: 16, fontWeight: 'bold', marginRight: 15, color: 'green' },
     amountNegative: { alignSelf: 'center', fontSize: 16, fontWeight: 'bold', marginRight: 15, color: 'red' },